@@ -45,18 +45,23 @@ def upgrade() -> None:
         sa.PrimaryKeyConstraint("id"),
     )
 
-    # Create index on user_id for faster lookups
-    op.create_index(
-        op.f("ix_pending_email_changes_user_id"),
-        "pending_email_changes",
-        ["user_id"],
-        unique=False,
-    )
+    # Create index on user_id for faster lookups (CONCURRENTLY needs autocommit)
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f("ix_pending_email_changes_user_id"),
+            "pending_email_changes",
+            ["user_id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
 
 
 def downgrade() -> None:
     # Drop the table
-    op.drop_index(
-        op.f("ix_pending_email_changes_user_id"), table_name="pending_email_changes"
-    )
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            op.f("ix_pending_email_changes_user_id"),
+            table_name="pending_email_changes",
+            postgresql_concurrently=True,
+        )
     op.drop_table("pending_email_changes")
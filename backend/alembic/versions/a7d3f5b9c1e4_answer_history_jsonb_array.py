@@ -0,0 +1,54 @@
+"""answer_history_jsonb_array
+
+Revision ID: a7d3f5b9c1e4
+Revises: f3c9a1b7d5e2
+Create Date: 2026-10-16 16:20:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a7d3f5b9c1e4"
+down_revision: Union[str, None] = "f3c9a1b7d5e2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column(
+        "flashcards",
+        "user_answer_history",
+        existing_type=sa.JSON(),
+        type_=postgresql.JSONB(),
+        postgresql_using="user_answer_history::jsonb",
+    )
+    # {"<timestamp>": {...}} objects become [{..., "ts": "<timestamp>"}], oldest first
+    op.execute(
+        """
+        UPDATE flashcards SET user_answer_history = (
+          SELECT COALESCE(
+            jsonb_agg(e.value || jsonb_build_object('ts', e.key) ORDER BY e.key),
+            '[]'::jsonb
+          )
+          FROM jsonb_each(user_answer_history) e
+        )
+        WHERE jsonb_typeof(user_answer_history) = 'object'
+        """
+    )
+
+
+def downgrade() -> None:
+    # Entries stay in list form; only the column type is reverted
+    op.alter_column(
+        "flashcards",
+        "user_answer_history",
+        existing_type=postgresql.JSONB(),
+        type_=sa.JSON(),
+        postgresql_using="user_answer_history::json",
+    )
@@ -9,7 +9,6 @@ Create Date: 2025-01-27 10:00:00.000000
 from alembic import op
 import sqlalchemy as sa
 from sqlalchemy.dialects import postgresql
-import uuid
 
 # revision identifiers, used by Alembic.
 revision = "add_username_field"
@@ -22,38 +21,37 @@ def upgrade():
     # Add username column (nullable initially to allow existing users)
     op.add_column("users", sa.Column("username", sa.String(50), nullable=True))
 
-    # Create unique index on username
-    op.create_index("ix_users_username", "users", ["username"], unique=True)
-
     # Backfill existing users with generated usernames
-    # This ensures no conflicts when we make username non-null
-    connection = op.get_bind()
-
-    # Get all existing users without usernames
-    users = connection.execute(
-        sa.text("SELECT id FROM users WHERE username IS NULL")
-    ).fetchall()
-
-    # Generate unique usernames for each user
-    for user in users:
-        user_id = user[0]
-        # Generate username like 'user_<first_8_chars_of_id>'
-        username = f"user_{str(user_id)[:8]}"
-
-        # Ensure uniqueness by checking if username exists
-        counter = 1
-        original_username = username
-        while connection.execute(
-            sa.text("SELECT 1 FROM users WHERE username = :username"),
-            {"username": username},
-        ).fetchone():
-            username = f"{original_username}_{counter}"
-            counter += 1
-
-        # Update the user with the generated username
-        connection.execute(
-            sa.text("UPDATE users SET username = :username WHERE id = :user_id"),
-            {"username": username, "user_id": user_id},
+    # This ensures no conflicts when we make username non-null.
+    # Usernames look like 'user_<first_8_chars_of_id>'; ids sharing that prefix
+    # get '_1', '_2', ... suffixes. Done set-based in a single statement.
+    op.execute(
+        """
+        UPDATE users AS u
+        SET username = sub.base
+            || CASE WHEN sub.rn > 1 THEN '_' || (sub.rn - 1)::text ELSE '' END
+        FROM (
+            SELECT id,
+                   'user_' || substr(id::text, 1, 8) AS base,
+                   row_number() OVER (
+                       PARTITION BY substr(id::text, 1, 8) ORDER BY id
+                   ) AS rn
+            FROM users
+            WHERE username IS NULL
+        ) AS sub
+        WHERE u.id = sub.id
+        """
+    )
+
+    # Create unique index on username without locking writes on users.
+    # CONCURRENTLY cannot run inside a transaction, so step out of it.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_users_username",
+            "users",
+            ["username"],
+            unique=True,
+            postgresql_concurrently=True,
         )
 
     # Now make username non-nullable
@@ -62,7 +60,10 @@ def upgrade():
 
 def downgrade():
     # Remove the unique index
-    op.drop_index("ix_users_username", table_name="users")
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_users_username", table_name="users", postgresql_concurrently=True
+        )
 
     # Remove the username column
     op.drop_column("users", "username")
@@ -0,0 +1,43 @@
+"""flashcard_scores_smallint
+
+Revision ID: b5e1c3a7d9f2
+Revises: c297091e7da0
+Create Date: 2026-10-16 13:40:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b5e1c3a7d9f2"
+down_revision: Union[str, None] = "c297091e7da0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Bounded scores (1-5 difficulty, 0-100 percentages) fit in two bytes
+SMALLINT_COLUMNS = ["difficulty", "mastery_level", "last_performance"]
+
+
+def upgrade() -> None:
+    for column in SMALLINT_COLUMNS:
+        op.alter_column(
+            "flashcards",
+            column,
+            type_=sa.SmallInteger(),
+            existing_type=sa.Integer(),
+            postgresql_using=f"{column}::smallint",
+        )
+
+
+def downgrade() -> None:
+    for column in SMALLINT_COLUMNS:
+        op.alter_column(
+            "flashcards",
+            column,
+            type_=sa.Integer(),
+            existing_type=sa.SmallInteger(),
+        )
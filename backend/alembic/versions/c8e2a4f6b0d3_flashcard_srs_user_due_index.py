@@ -0,0 +1,43 @@
+"""flashcard_srs_user_due_index
+
+Revision ID: c8e2a4f6b0d3
+Revises: a7d3f5b9c1e4
+Create Date: 2026-10-16 16:50:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c8e2a4f6b0d3"
+down_revision: Union[str, None] = "a7d3f5b9c1e4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The SRS due queue filters user_id + due_date <= today, earliest first.
+    # The flashcards side (user_id, next_review NULLS LAST, created_at DESC)
+    # came in with the schema script in f3c9a1b7d5e2.
+    # CONCURRENTLY cannot run inside a transaction, so step out of it.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "idx_flashcard_srs_user_due",
+            "flashcard_srs",
+            ["user_id", "due_date"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "idx_flashcard_srs_user_due",
+            table_name="flashcard_srs",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,63 @@
+"""tags_default_empty_and_gin
+
+Revision ID: e8a4d2c6f1b3
+Revises: b5e1c3a7d9f2
+Create Date: 2026-10-16 14:10:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e8a4d2c6f1b3"
+down_revision: Union[str, None] = "b5e1c3a7d9f2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TAGGED_TABLES = ["notes", "flashcards"]
+
+
+def upgrade() -> None:
+    for table in TAGGED_TABLES:
+        op.execute(f"UPDATE {table} SET tags = '{{}}' WHERE tags IS NULL")
+        op.alter_column(
+            table,
+            "tags",
+            existing_type=postgresql.ARRAY(sa.String()),
+            nullable=False,
+            server_default="{}",
+        )
+    # Build the GIN index without locking writes on flashcards.
+    # CONCURRENTLY cannot run inside a transaction, so step out of it.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "idx_flashcards_tags_gin",
+            "flashcards",
+            ["tags"],
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "idx_flashcards_tags_gin",
+            table_name="flashcards",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    for table in TAGGED_TABLES:
+        op.alter_column(
+            table,
+            "tags",
+            existing_type=postgresql.ARRAY(sa.String()),
+            nullable=True,
+            server_default=None,
+        )
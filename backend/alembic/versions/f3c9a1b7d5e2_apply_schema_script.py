@@ -0,0 +1,283 @@
+"""apply_schema_script
+
+Revision ID: f3c9a1b7d5e2
+Revises: e8a4d2c6f1b3
+Create Date: 2026-10-16 14:40:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f3c9a1b7d5e2"
+down_revision: Union[str, None] = "e8a4d2c6f1b3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# The schema script as it stood at this revision, frozen here so later edits
+# to app.database don't change what this migration does. Tables outside the
+# Alembic history (events, note_links, flashcard_srs, flashcard_reviews, ...)
+# were only ever created by create_all at startup; their DDL is spelled out
+# first. Indexes on tables that may already hold data are built concurrently
+# afterwards (see CONCURRENT_INDEXES).
+SCHEMA_SQL = """
+-- Tables previously created by create_all
+CREATE TABLE IF NOT EXISTS note_links (
+  id UUID PRIMARY KEY,
+  from_note_id UUID NOT NULL REFERENCES notes(id),
+  to_note_id UUID NOT NULL REFERENCES notes(id),
+  link_type VARCHAR(50) NOT NULL,
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS ix_note_links_from_note_id ON note_links(from_note_id);
+CREATE INDEX IF NOT EXISTS ix_note_links_to_note_id ON note_links(to_note_id);
+CREATE TABLE IF NOT EXISTS flashcard_srs (
+  flashcard_id UUID PRIMARY KEY REFERENCES flashcards(id),
+  user_id UUID NOT NULL REFERENCES users(id),
+  efactor INTEGER,
+  interval_days INTEGER,
+  due_date DATE NOT NULL,
+  repetitions INTEGER,
+  created_at TIMESTAMPTZ DEFAULT NOW(),
+  updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS flashcard_sets (
+  id UUID PRIMARY KEY,
+  user_id UUID NOT NULL REFERENCES users(id),
+  mode VARCHAR(20) NOT NULL,
+  seed_note_id UUID NOT NULL REFERENCES notes(id),
+  neighbor_note_ids UUID[],
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS flashcard_reviews (
+  id UUID PRIMARY KEY,
+  flashcard_id UUID NOT NULL REFERENCES flashcards(id),
+  user_id UUID NOT NULL REFERENCES users(id),
+  typed_answer TEXT NOT NULL,
+  ai_score SMALLINT,
+  verdict VARCHAR(20),
+  feedback TEXT,
+  missing_points VARCHAR[],
+  confidence SMALLINT,
+  reviewed_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Columns added after the initial schema
+ALTER TABLE users ADD COLUMN IF NOT EXISTS username VARCHAR(50);
+ALTER TABLE notes ADD COLUMN IF NOT EXISTS tags TEXT[] NOT NULL DEFAULT '{}';
+-- Tag arrays default to empty server-side rather than NULL
+UPDATE notes SET tags = '{}' WHERE tags IS NULL;
+ALTER TABLE notes ALTER COLUMN tags SET DEFAULT '{}', ALTER COLUMN tags SET NOT NULL;
+UPDATE flashcards SET tags = '{}' WHERE tags IS NULL;
+ALTER TABLE flashcards
+  ALTER COLUMN tags SET DEFAULT '{}', ALTER COLUMN tags SET NOT NULL;
+
+-- Events; event_type is the event_kind enum
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = 'event_kind') THEN
+    CREATE TYPE event_kind AS ENUM (
+      'NOTE_CREATED', 'NOTE_REVIEWED', 'NOTE_UPDATED',
+      'FLASHCARD_CREATED', 'FLASHCARD_REVIEWED', 'FLASHCARD_UPDATED',
+      'FLASHCARD_TAGGED'
+    );
+  END IF;
+END
+$$;
+CREATE TABLE IF NOT EXISTS events (
+  id UUID PRIMARY KEY,
+  user_id UUID NOT NULL REFERENCES users(id),
+  event_type event_kind NOT NULL,
+  occurred_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  target_id UUID NULL,
+  metadata JSON NULL
+);
+CREATE INDEX IF NOT EXISTS ix_events_target_id ON events(target_id);
+-- Older tables stored event_type as VARCHAR; convert unless a row holds a
+-- type outside the enum
+DO $$
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_name = 'events' AND column_name = 'event_type'
+      AND udt_name <> 'event_kind'
+  ) THEN
+    ALTER TABLE events
+      ALTER COLUMN event_type TYPE event_kind USING event_type::event_kind;
+  END IF;
+EXCEPTION WHEN invalid_text_representation THEN
+  RAISE NOTICE 'events.event_type has unknown values; left as VARCHAR';
+END
+$$;
+-- user_id alone is a prefix of the composite indexes built below
+DROP INDEX IF EXISTS idx_events_user;
+DROP INDEX IF EXISTS ix_events_user_id;
+
+-- Similarities: keyed by the ordered pair, score as 0..1000 smallint.
+-- Older tables had a surrogate UUID id and an INTEGER score; convert them.
+CREATE TABLE IF NOT EXISTS note_similarities (
+  note_a_id UUID NOT NULL REFERENCES notes(id),
+  note_b_id UUID NOT NULL REFERENCES notes(id),
+  similarity SMALLINT NOT NULL,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (note_a_id, note_b_id)
+);
+ALTER TABLE note_similarities ALTER COLUMN similarity TYPE SMALLINT;
+ALTER TABLE note_similarities DROP COLUMN IF EXISTS id;
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_constraint
+    WHERE conrelid = 'note_similarities'::regclass AND contype = 'p'
+  ) THEN
+    ALTER TABLE note_similarities ADD PRIMARY KEY (note_a_id, note_b_id);
+  END IF;
+END
+$$;
+DROP INDEX IF EXISTS uq_note_similarity_pair;
+DROP INDEX IF EXISTS idx_sim_a;
+DROP INDEX IF EXISTS ix_note_similarities_note_a_id;
+
+-- 0-100 review scores fit in two bytes (flashcard_reviews is not under Alembic)
+ALTER TABLE flashcard_reviews ALTER COLUMN ai_score TYPE SMALLINT;
+ALTER TABLE flashcard_reviews ALTER COLUMN confidence TYPE SMALLINT;
+
+-- Substring search on flashcards (ILIKE '%term%') uses trigram indexes; the
+-- extension needs CREATE privilege, so the indexes are skipped when it's
+-- missing
+DO $$
+BEGIN
+  CREATE EXTENSION IF NOT EXISTS pg_trgm;
+EXCEPTION WHEN insufficient_privilege THEN
+  RAISE NOTICE 'pg_trgm unavailable, skipping trigram indexes';
+END
+$$;
+
+-- Activity daily aggregate; reads filter user + kind and range over day,
+-- and the covering count keeps them index-only
+CREATE TABLE IF NOT EXISTS activity_daily (
+  user_id UUID NOT NULL,
+  day DATE NOT NULL,
+  kind VARCHAR(16) NOT NULL,
+  count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY(user_id, day, kind)
+);
+CREATE INDEX IF NOT EXISTS idx_activity_daily_user_kind_day
+  ON activity_daily(user_id, kind, day) INCLUDE (count);
+
+CREATE OR REPLACE FUNCTION bump_activity_daily() RETURNS trigger AS $$
+DECLARE
+  d date := DATE(NEW.occurred_at AT TIME ZONE 'UTC');
+  k text := CASE
+    WHEN NEW.event_type IN ('NOTE_CREATED', 'NOTE_REVIEWED') THEN 'notes'
+    WHEN NEW.event_type IN ('FLASHCARD_CREATED', 'FLASHCARD_REVIEWED') THEN 'flashcards'
+  END;
+BEGIN
+  INSERT INTO activity_daily (user_id, day, kind, count)
+  VALUES (NEW.user_id, d, 'all', 1)
+  ON CONFLICT (user_id, day, kind) DO UPDATE SET count = activity_daily.count + 1;
+  IF k IS NOT NULL THEN
+    INSERT INTO activity_daily (user_id, day, kind, count)
+    VALUES (NEW.user_id, d, k, 1)
+    ON CONFLICT (user_id, day, kind) DO UPDATE SET count = activity_daily.count + 1;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'events_ai') THEN
+    CREATE TRIGGER events_ai AFTER INSERT ON events
+      FOR EACH ROW EXECUTE FUNCTION bump_activity_daily();
+
+    INSERT INTO activity_daily (user_id, day, kind, count)
+    SELECT e.user_id, DATE(e.occurred_at AT TIME ZONE 'UTC'), k.kind, COUNT(*)
+    FROM events e
+    CROSS JOIN LATERAL (
+      VALUES ('all'),
+             (CASE
+                WHEN e.event_type IN ('NOTE_CREATED', 'NOTE_REVIEWED') THEN 'notes'
+                WHEN e.event_type IN ('FLASHCARD_CREATED', 'FLASHCARD_REVIEWED') THEN 'flashcards'
+              END)
+    ) AS k(kind)
+    WHERE k.kind IS NOT NULL
+    GROUP BY 1, 2, 3
+    ON CONFLICT (user_id, day, kind) DO UPDATE SET count = EXCLUDED.count;
+  END IF;
+END
+$$;
+"""
+
+# (name, table, columns, create_index kwargs) for the indexes on tables that
+# may already be large; built concurrently so writes keep flowing.
+CONCURRENT_INDEXES = [
+    ("idx_events_type", "events", ["event_type"], {}),
+    ("idx_events_occurred", "events", ["occurred_at"], {}),
+    ("idx_events_user_day", "events", ["user_id", sa.text("occurred_at DESC")], {}),
+    (
+        "idx_events_user_type_day",
+        "events",
+        ["user_id", "event_type", sa.text("occurred_at DESC")],
+        {},
+    ),
+    ("brin_events_occurred", "events", ["occurred_at"], {"postgresql_using": "brin"}),
+    # Per-user lists in the order they are read: notes newest first,
+    # flashcards by next review (unscheduled last) then newest
+    ("idx_notes_user_created", "notes", ["user_id", sa.text("created_at DESC")], {}),
+    (
+        "idx_flashcards_user_review",
+        "flashcards",
+        ["user_id", sa.text("next_review NULLS LAST"), sa.text("created_at DESC")],
+        {},
+    ),
+    ("idx_sim_b", "note_similarities", ["note_b_id"], {}),
+    # Backlink lookups filter on to_note_id and read from_note_id
+    ("idx_notelinks_to_from", "note_links", ["to_note_id", "from_note_id"], {}),
+]
+
+TRGM_INDEXES = [
+    ("idx_flashcards_q_trgm", "question"),
+    ("idx_flashcards_a_trgm", "answer"),
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    bind.exec_driver_sql(SCHEMA_SQL)
+    has_trgm = bind.exec_driver_sql(
+        "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+    ).scalar()
+
+    # CONCURRENTLY cannot run inside a transaction, so step out of it
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in CONCURRENT_INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+                **kwargs,
+            )
+        if has_trgm:
+            for name, column in TRGM_INDEXES:
+                op.create_index(
+                    name,
+                    "flashcards",
+                    [column],
+                    postgresql_using="gin",
+                    postgresql_ops={column: "gin_trgm_ops"},
+                    postgresql_concurrently=True,
+                    if_not_exists=True,
+                )
+
+
+def downgrade() -> None:
+    # The script only adds or converts objects used by the current models
+    pass
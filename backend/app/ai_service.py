@@ -3,15 +3,23 @@ AI service integration for StudentsAI MVP using OpenAI
 """
 
 import asyncio
+import functools
+import hashlib
 import logging
-from typing import List, Dict, Any
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple
+import httpx
 import openai
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import orjson
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
 import numpy as np
+from scipy import sparse
 import re
 
-from .config import OPENAI_API_KEY
+from .config import OPENAI_API_KEY, OPENAI_MAX_CONNECTIONS
 from .schemas import GeneratedFlashcard
 
 # Configure OpenAI
@@ -20,37 +28,174 @@ openai.api_key = OPENAI_API_KEY
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Fitted TF-IDF models kept per corpus (LRU), shared by every AIService
+TFIDF_CACHE_SIZE = 64
+_tfidf_cache: OrderedDict = OrderedDict()
+_tfidf_cache_lock = threading.Lock()
+_tfidf_cache_stats = {"hits": 0, "misses": 0}
+
+# Stateless hashing vectorizer: one note can be vectorized on its own, so
+# similarities for a single note cost O(n·nnz) with no corpus refit
+_HASHING_VECTORIZER = HashingVectorizer(
+    n_features=2**18,
+    stop_words="english",
+    ngram_range=(1, 2),
+    norm="l2",
+    alternate_sign=False,
+    dtype=np.float32,
+)
+
+# Prompt templates, built once; only the content varies per call
+SUMMARY_PROMPT_TEMPLATE = """
+Please provide a concise summary of the following text.
+Focus on the key points and main ideas.
+Keep the summary clear and well-structured.
+
+Text to summarize:
+{content}
+
+Summary:
+"""
+
+FLASHCARDS_PROMPT_TEMPLATE = """
+Create {count} educational flashcards from the following content.
+Each flashcard should have a clear question and a concise answer.
+Focus on key concepts, definitions, and important facts.
+Format your response as a JSON array with objects containing "question" and "answer" fields.
+
+Content:
+{content}
+
+Generate exactly {count} flashcards in this JSON format:
+[
+    {{"question": "What is...", "answer": "..."}},
+    {{"question": "How does...", "answer": "..."}},
+    ...
+]
+"""
+
+_SUMMARY_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "You are a helpful assistant that creates clear, concise summaries of academic and educational content.",
+}
+
+_FLASHCARDS_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "You are an educational assistant that creates high-quality study flashcards. Always respond with valid JSON.",
+}
+
+# Keyword extraction: whitespace runs and sentence boundaries
+_WHITESPACE_RE = re.compile(r"\s+")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+
+# "Q: ..." / "Answer: ..." lines in free-form model output
+_QA_LINE_RE = re.compile(r"^[^\S\n]*(Question|Answer|Q|A):(.*)$", re.MULTILINE)
+
+
+def _calibrate_similarities(values: np.ndarray) -> np.ndarray:
+    """Boost medium similarities upward in place: min(1, sqrt(max(sim, 0)) * 1.1).
+    Each step writes back into the same buffer, so no temporaries are allocated.
+    """
+    np.maximum(values, 0.0, out=values)
+    np.sqrt(values, out=values)
+    values *= 1.1
+    np.minimum(values, 1.0, out=values)
+    return values
+
+
+def _fit_tfidf(texts: List[str], **params: Any) -> Tuple[TfidfVectorizer, sparse.csr_matrix]:
+    """Fit a TfidfVectorizer on texts, reusing a cached fit for an identical corpus.
+    The fit is keyed by a digest of the params and texts, so any note edit,
+    addition or removal refits. The returned matrix is shared with the cache and
+    must not be modified.
+    """
+    digest = hashlib.blake2b(repr(sorted(params.items())).encode(), digest_size=16)
+    for text in texts:
+        data = text.encode()
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    key = digest.digest()
+
+    with _tfidf_cache_lock:
+        cached = _tfidf_cache.get(key)
+        if cached is not None:
+            _tfidf_cache.move_to_end(key)
+            _tfidf_cache_stats["hits"] += 1
+            logger.debug(
+                "TF-IDF cache hit (%d hits / %d misses)",
+                _tfidf_cache_stats["hits"],
+                _tfidf_cache_stats["misses"],
+            )
+            return cached
+        _tfidf_cache_stats["misses"] += 1
+
+    vectorizer = TfidfVectorizer(**params)
+    matrix = vectorizer.fit_transform(texts)
+
+    with _tfidf_cache_lock:
+        _tfidf_cache[key] = (vectorizer, matrix)
+        if len(_tfidf_cache) > TFIDF_CACHE_SIZE:
+            _tfidf_cache.popitem(last=False)
+
+    return vectorizer, matrix
+
+
+# One OpenAI client per process. The HTTP pool is sized above httpx's default
+# of 100 so batched calls are limited by the semaphore/provider rather than by
+# connections, and every AIService shares it instead of opening its own
+_shared_httpx = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+    ),
+    timeout=httpx.Timeout(120.0),
+)
+_shared_client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=_shared_httpx)
+
+
+async def close_shared_client():
+    """Close the process-wide OpenAI client and its connection pool"""
+    await _shared_client.close()
+
 
 class AIService:
     """AI service for text processing and generation"""
 
-    def __init__(self):
-        self.client = openai.OpenAI(api_key=OPENAI_API_KEY)
+    def __init__(self, client: openai.AsyncOpenAI = None):
+        # Injectable for tests; defaults to the process-wide client
+        self.client = client or _shared_client
+        # Caps in-flight OpenAI calls for batch jobs (keep under the account's RPM tier)
+        self._semaphore = asyncio.Semaphore(20)
+        # CPU-bound scikit-learn/NumPy work runs here so it never blocks the
+        # event loop; the heavy parts release the GIL in C code
+        self._pool = ThreadPoolExecutor(
+            max_workers=os.cpu_count(), thread_name_prefix="ai-cpu"
+        )
+
+    async def close(self):
+        """Shut down the CPU worker pool (the shared client is closed separately)"""
+        self._pool.shutdown(wait=False)
+
+    async def _run_in_pool(self, func, *args, **kwargs):
+        """Run a blocking function on the CPU worker pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._pool, functools.partial(func, *args, **kwargs)
+        )
+
+    async def _bounded(self, coro):
+        """Await a coroutine while holding a concurrency slot"""
+        async with self._semaphore:
+            return await coro
 
     async def summarize_text(self, content: str) -> str:
         """Generate summary of text content"""
         try:
-            prompt = f"""
-            Please provide a concise summary of the following text. 
-            Focus on the key points and main ideas. 
-            Keep the summary clear and well-structured.
-            
-            Text to summarize:
-            {content}
-            
-            Summary:
-            """
-
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
+            prompt = SUMMARY_PROMPT_TEMPLATE.format_map({"content": content})
+
+            response = await self.client.chat.completions.create(
                 model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful assistant that creates clear, concise summaries of academic and educational content.",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
+                messages=[_SUMMARY_SYSTEM_MESSAGE, {"role": "user", "content": prompt}],
                 max_tokens=2000,
                 temperature=0.3,
             )
@@ -67,31 +212,14 @@ class AIService:
     ) -> List[GeneratedFlashcard]:
         """Generate flashcards from text content"""
         try:
-            prompt = f"""
-            Create {count} educational flashcards from the following content.
-            Each flashcard should have a clear question and a concise answer.
-            Focus on key concepts, definitions, and important facts.
-            Format your response as a JSON array with objects containing "question" and "answer" fields.
-            
-            Content:
-            {content}
-            
-            Generate exactly {count} flashcards in this JSON format:
-            [
-                {{"question": "What is...", "answer": "..."}},
-                {{"question": "How does...", "answer": "..."}},
-                ...
-            ]
-            """
+            prompt = FLASHCARDS_PROMPT_TEMPLATE.format_map(
+                {"count": count, "content": content}
+            )
 
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
+            response = await self.client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an educational assistant that creates high-quality study flashcards. Always respond with valid JSON.",
-                    },
+                    _FLASHCARDS_SYSTEM_MESSAGE,
                     {"role": "user", "content": prompt},
                 ],
                 max_tokens=1000,
@@ -101,10 +229,8 @@ class AIService:
             response_text = response.choices[0].message.content.strip()
 
             # Parse JSON response
-            import json
-
             try:
-                decoded = json.loads(response_text)
+                decoded = orjson.loads(response_text)
 
                 # Some models wrap the list, e.g. {"flashcards": [...]} or {"cards": [...]}
                 if isinstance(decoded, dict):
@@ -138,7 +264,7 @@ class AIService:
                     return self._parse_flashcards_fallback(response_text, count)
 
                 return normalized[:count]
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 # Fallback: extract Q&A pairs manually
                 return self._parse_flashcards_fallback(response_text, count)
 
@@ -151,24 +277,26 @@ class AIService:
     ) -> List[GeneratedFlashcard]:
         """Fallback parser for flashcards when JSON parsing fails"""
         flashcards = []
-        lines = text.split("\n")
 
         current_question = None
         current_answer = None
 
-        for line in lines:
-            line = line.strip()
-            if line.startswith("Q:") or line.startswith("Question:"):
+        # Scan Q/A lines in one pass and stop as soon as `count` cards are found
+        for match in _QA_LINE_RE.finditer(text):
+            label, value = match.group(1), match.group(2).strip()
+            if label in ("Q", "Question"):
                 if current_question and current_answer:
                     flashcards.append(
                         GeneratedFlashcard(
                             question=current_question, answer=current_answer
                         )
                     )
-                current_question = line.split(":", 1)[1].strip()
+                    if len(flashcards) >= count:
+                        return flashcards
+                current_question = value
                 current_answer = None
-            elif line.startswith("A:") or line.startswith("Answer:"):
-                current_answer = line.split(":", 1)[1].strip()
+            else:
+                current_answer = value
 
         # Add the last flashcard
         if current_question and current_answer:
@@ -187,31 +315,44 @@ class AIService:
 
         return flashcards[:count]
 
+    def calculate_similarity_sparse(
+        self, texts: List[str], min_simil: float = 0.0
+    ) -> sparse.csr_matrix:
+        """Calibrated TF-IDF similarity matrix as CSR, dropping entries below min_simil"""
+        # Create TF-IDF vectors (float32: halves the bandwidth of X @ X.T, and the
+        # calibrated scores don't need double precision)
+        # More permissive vectorizer to make similarity matching easier
+        _, tfidf_matrix = _fit_tfidf(
+            texts,
+            max_features=3000,
+            stop_words="english",
+            ngram_range=(1, 2),
+            sublinear_tf=True,
+            norm="l2",
+            dtype=np.float32,
+        )
+
+        # Rows are already L2-normalized (norm="l2"), so cosine similarity is
+        # just X @ X.T, kept sparse until the end
+        similarity_matrix = (tfidf_matrix @ tfidf_matrix.T).tocsr()
+        # Calibrate similarities to be less strict: boost medium sims upward.
+        # The calibration maps 0 to 0, so it only needs to touch the stored nonzeros.
+        _calibrate_similarities(similarity_matrix.data)
+
+        # Floor weak pairs so memory scales with the number of edges, not n²
+        if min_simil > 0:
+            similarity_matrix.data[similarity_matrix.data < min_simil] = 0.0
+            similarity_matrix.eliminate_zeros()
+
+        return similarity_matrix
+
     def calculate_similarity(self, texts: List[str]) -> np.ndarray:
         """Calculate similarity matrix between texts using TF-IDF"""
         if len(texts) < 2:
             return np.array([[1.0]])
 
         try:
-            # Create TF-IDF vectors
-            # More permissive vectorizer to make similarity matching easier
-            vectorizer = TfidfVectorizer(
-                max_features=3000,
-                stop_words="english",
-                ngram_range=(1, 2),
-                sublinear_tf=True,
-                norm="l2",
-            )
-
-            tfidf_matrix = vectorizer.fit_transform(texts)
-
-            # Calculate cosine similarity
-            similarity_matrix = cosine_similarity(tfidf_matrix)
-            # Calibrate similarities to be less strict: boost medium sims upward
-            # boosted = min(1, sqrt(sim) * 1.1)
-            boosted = np.minimum(1.0, np.sqrt(np.maximum(similarity_matrix, 0.0)) * 1.1)
-
-            return boosted
+            return self.calculate_similarity_sparse(texts).toarray()
 
         except Exception as e:
             logger.error(f"Error calculating similarity: {str(e)}")
@@ -226,33 +367,78 @@ class AIService:
         if len(notes) < 2:
             return []
 
-        # Extract text content for similarity calculation
+        # Pull the columns out once; everything below indexes by position
+        ids = [note["id"] for note in notes]
         texts = [f"{note['title']} {note['content']}" for note in notes]
 
-        # Calculate similarity matrix
-        similarity_matrix = self.calculate_similarity(texts)
+        # Calculate similarity matrix, keeping only pairs that can pass the threshold
+        try:
+            similarity_matrix = self.calculate_similarity_sparse(texts, threshold)
+        except Exception as e:
+            logger.error(f"Error calculating similarity: {str(e)}")
+            return []
 
-        connections = []
-        n = len(notes)
+        # Take the stored upper-triangle entries above threshold, strongest first,
+        # with array ops rather than a per-pair Python loop
+        upper = sparse.triu(similarity_matrix, k=1, format="coo")
+        mask = upper.data > threshold
+        rows, cols, sims = upper.row[mask], upper.col[mask], upper.data[mask]
+        order = np.argsort(-sims, kind="stable")
+
+        connections = [
+            {
+                "source_id": ids[i],
+                "target_id": ids[j],
+                "similarity": similarity,
+                "connection_type": "similarity",
+            }
+            for i, j, similarity in zip(
+                rows[order].tolist(), cols[order].tolist(), sims[order].tolist()
+            )
+        ]
 
-        for i in range(n):
-            for j in range(i + 1, n):
-                similarity = similarity_matrix[i][j]
+        return connections
 
-                if similarity > threshold:
-                    connections.append(
-                        {
-                            "source_id": notes[i]["id"],
-                            "target_id": notes[j]["id"],
-                            "similarity": float(similarity),
-                            "connection_type": "similarity",
-                        }
-                    )
+    def calculate_similarity_row(self, text: str, texts: List[str]) -> np.ndarray:
+        """Calibrated similarity of one text against each of texts (hashed features)"""
+        if not texts:
+            return np.zeros(0)
+
+        vectors = _HASHING_VECTORIZER.transform([text, *texts])
+        row = (vectors[1:] @ vectors[0].T).toarray().ravel()
+        return _calibrate_similarities(row)
+
+    def find_similar_notes(
+        self,
+        note: Dict[str, Any],
+        candidates: List[Dict[str, Any]],
+        threshold: float = 0.6,
+        top_k: int = 5,
+    ) -> List[Dict[str, Any]]:
+        """Find the strongest connections from one note to candidate notes"""
+        if not candidates:
+            return []
 
-        # Sort by similarity (highest first)
-        connections.sort(key=lambda x: x["similarity"], reverse=True)
+        try:
+            sims = self.calculate_similarity_row(
+                f"{note['title']} {note['content']}",
+                [f"{c['title']} {c['content']}" for c in candidates],
+            )
+        except Exception as e:
+            logger.error(f"Error calculating similarity: {str(e)}")
+            return []
 
-        return connections
+        order = np.argsort(-sims, kind="stable")[:top_k]
+        return [
+            {
+                "source_id": note["id"],
+                "target_id": candidates[i]["id"],
+                "similarity": float(sims[i]),
+                "connection_type": "similarity",
+            }
+            for i in order.tolist()
+            if sims[i] > threshold
+        ]
 
     def extract_keywords(self, text: str, max_keywords: int = 12) -> List[str]:
         """Lightweight keyword extraction using TF-IDF on the single document split into chunks.
@@ -262,30 +448,105 @@ class AIService:
             return []
         try:
             # Basic cleanup
-            text = re.sub(r"\s+", " ", text)
+            text = _WHITESPACE_RE.sub(" ", text)
             # Split into pseudo-docs (sentences) so TF-IDF makes sense
-            sentences = re.split(r"(?<=[.!?])\s+", text)
+            sentences = _SENTENCE_SPLIT_RE.split(text)
             sentences = [s for s in sentences if len(s.split()) >= 3]
             if len(sentences) < 3:
                 sentences = [text]
 
-            vectorizer = TfidfVectorizer(
-                max_features=2000, stop_words="english", ngram_range=(1, 2)
+            vectorizer, tfidf_matrix = _fit_tfidf(
+                sentences,
+                max_features=2000,
+                stop_words="english",
+                ngram_range=(1, 2),
+                dtype=np.float32,
             )
-            tfidf_matrix = vectorizer.fit_transform(sentences)
             # Aggregate scores across sentences
             scores = np.asarray(tfidf_matrix.sum(axis=0)).ravel()
-            terms = np.array(vectorizer.get_feature_names_out())
-            # Rank by score
-            top_indices = np.argsort(scores)[::-1]
-            ranked_terms = [terms[i] for i in top_indices]
+            terms = vectorizer.get_feature_names_out()
+            # Rank only a shortlist: partial selection (O(V)) plus a small sort,
+            # with headroom for terms dropped by the length filter below
+            k = min(max_keywords * 3, scores.size)
+            if k < scores.size:
+                top_indices = np.argpartition(-scores, k)[:k]
+            else:
+                top_indices = np.arange(scores.size)
+            top_indices = top_indices[np.argsort(-scores[top_indices], kind="stable")]
             # Filter out very short tokens
-            ranked_terms = [t for t in ranked_terms if len(t) > 2][:max_keywords]
+            ranked_terms = [
+                str(terms[i]) for i in top_indices if len(terms[i]) > 2
+            ][:max_keywords]
             return ranked_terms
         except Exception as e:
             logger.warning(f"Keyword extraction failed: {e}")
             return []
 
+    async def batch_summarize(self, contents: List[str]) -> List[Any]:
+        """Summarize many texts concurrently, bounded by the batch semaphore.
+        Results keep input order; a failed item is returned as its exception.
+        """
+        return await asyncio.gather(
+            *[self._bounded(self.summarize_text(content)) for content in contents],
+            return_exceptions=True,
+        )
+
+    async def batch_generate_flashcards(
+        self, contents: List[str], count: int = 5
+    ) -> List[Any]:
+        """Generate flashcards for many texts concurrently, bounded by the batch semaphore.
+        Results keep input order; a failed item is returned as its exception.
+        """
+        return await asyncio.gather(
+            *[
+                self._bounded(self.generate_flashcards(content, count))
+                for content in contents
+            ],
+            return_exceptions=True,
+        )
+
+    async def calculate_similarity_async(self, texts: List[str]) -> np.ndarray:
+        """calculate_similarity on the CPU worker pool"""
+        return await self._run_in_pool(self.calculate_similarity, texts)
+
+    async def find_note_connections_async(
+        self, notes: List[Dict[str, Any]], threshold: float = 0.6
+    ) -> List[Dict[str, Any]]:
+        """find_note_connections on the CPU worker pool"""
+        return await self._run_in_pool(self.find_note_connections, notes, threshold)
+
+    async def find_similar_notes_async(
+        self,
+        note: Dict[str, Any],
+        candidates: List[Dict[str, Any]],
+        threshold: float = 0.6,
+        top_k: int = 5,
+    ) -> List[Dict[str, Any]]:
+        """find_similar_notes on the CPU worker pool"""
+        return await self._run_in_pool(
+            self.find_similar_notes, note, candidates, threshold, top_k
+        )
+
+    async def extract_keywords_async(
+        self, text: str, max_keywords: int = 12
+    ) -> List[str]:
+        """extract_keywords on the CPU worker pool"""
+        return await self._run_in_pool(self.extract_keywords, text, max_keywords)
+
+    async def generate_all(
+        self, content: str, count: int = 5, max_keywords: int = 12
+    ) -> Dict[str, Any]:
+        """Generate summary, flashcards and keywords for one piece of content.
+        The OpenAI calls and the local TF-IDF keyword pass are independent, so
+        they run concurrently and total latency is the slowest task, not the sum.
+        """
+        summary, flashcards, keywords = await asyncio.gather(
+            self.summarize_text(content),
+            self.generate_flashcards(content, count),
+            self.extract_keywords_async(content, max_keywords),
+        )
+        return {"summary": summary, "flashcards": flashcards, "keywords": keywords}
+
 
 # Global AI service instance
 ai_service = AIService()
@@ -304,14 +565,42 @@ async def generate_flashcards_from_content(
     return await ai_service.generate_flashcards(content, count)
 
 
-def calculate_note_similarities(notes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+async def batch_summarize_contents(contents: List[str]) -> List[Any]:
+    """Summarize many texts concurrently"""
+    return await ai_service.batch_summarize(contents)
+
+
+async def batch_generate_flashcards_from_contents(
+    contents: List[str], count: int = 5
+) -> List[Any]:
+    """Generate flashcards for many texts concurrently"""
+    return await ai_service.batch_generate_flashcards(contents, count)
+
+
+async def calculate_note_similarities(
+    notes: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
     """Calculate similarities between notes"""
-    return ai_service.find_note_connections(notes)
+    return await ai_service.find_note_connections_async(notes)
+
+
+async def find_related_notes(
+    note: Dict[str, Any], candidates: List[Dict[str, Any]], top_k: int = 5
+) -> List[Dict[str, Any]]:
+    """Find the notes most similar to one note"""
+    return await ai_service.find_similar_notes_async(note, candidates, top_k=top_k)
 
 
-def extract_keywords_from_text(text: str, max_keywords: int = 12) -> List[str]:
+async def extract_keywords_from_text(text: str, max_keywords: int = 12) -> List[str]:
     """Extract keywords from text using TF-IDF"""
-    return ai_service.extract_keywords(text, max_keywords)
+    return await ai_service.extract_keywords_async(text, max_keywords)
+
+
+async def generate_all_from_content(
+    content: str, count: int = 5, max_keywords: int = 12
+) -> Dict[str, Any]:
+    """Generate summary, flashcards and keywords concurrently"""
+    return await ai_service.generate_all(content, count, max_keywords)
 
 
 async def evaluate_answer_with_llm(prompt: str) -> str:
@@ -334,9 +623,7 @@ async def evaluate_answer_with_llm(prompt: str) -> str:
             "confidence": 88,
         }
 
-        import json
-
-        return json.dumps(mock_response)
+        return orjson.dumps(mock_response).decode()
 
     except Exception as e:
         from .config import DEBUG
@@ -354,6 +641,4 @@ async def evaluate_answer_with_llm(prompt: str) -> str:
             "confidence": 50,
         }
 
-        import json
-
-        return json.dumps(fallback_response)
+        return orjson.dumps(fallback_response).decode()
@@ -2,11 +2,15 @@
 Authentication and authorization for StudentsAI MVP
 """
 
+import asyncio
+import threading
+import time
 import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 
-from fastapi import Depends, HTTPException, status
+from cachetools import TTLCache
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -22,12 +26,24 @@ from .database import (
 )
 from .schemas import TokenData, UserCreate, UserLogin
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing: argon2 for new hashes; existing bcrypt hashes still verify
+# and are upgraded on the next successful login
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__time_cost=2,
+    argon2__memory_cost=19456,
+    argon2__parallelism=1,
+)
 
 # JWT token handling
 security = HTTPBearer()
 
+# Decoded tokens (token -> (TokenData, exp)); entries live at most 60s and
+# never past the token's own expiry
+_token_cache: TTLCache = TTLCache(maxsize=10000, ttl=60)
+_token_cache_lock = threading.Lock()
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
@@ -55,6 +71,11 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 def verify_token(token: str) -> Optional[TokenData]:
     """Verify and decode JWT token"""
+    with _token_cache_lock:
+        cached = _token_cache.get(token)
+    if cached is not None and cached[1] > time.time():
+        return cached[0]
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
@@ -62,25 +83,41 @@ def verify_token(token: str) -> Optional[TokenData]:
         if email is None:
             return None
 
-        return TokenData(email=email)
+        token_data = TokenData(email=email)
+        exp = payload.get("exp")
+        if exp is not None:
+            with _token_cache_lock:
+                _token_cache[token] = (token_data, exp)
+        return token_data
     except JWTError:
         return None
 
 
-def authenticate_user(db: Session, email: str, password: str):
+async def authenticate_user(db: Session, email: str, password: str):
     """Authenticate user with email and password"""
-    user = get_user_by_email(db, email)
+    # Straight from the database: a password change or deletion elsewhere
+    # must take effect immediately, not when a cached copy expires
+    user = get_user_by_email(db, email, cached=False)
 
     if not user:
         return False
 
-    if not verify_password(password, user.password_hash):
+    # Hashing is CPU-bound; keep it off the event loop
+    verified, new_hash = await asyncio.to_thread(
+        pwd_context.verify_and_update, password, user.password_hash
+    )
+    if not verified:
         return False
 
+    # Re-hash legacy (bcrypt) passwords with the current scheme
+    if new_hash:
+        user.password_hash = new_hash
+        db.commit()
+
     return user
 
 
-def register_user(db: Session, user_data: UserCreate):
+async def register_user(db: Session, user_data: UserCreate):
     """Register a new user"""
     # Check if user already exists
     existing_user = get_user_by_email(db, user_data.email)
@@ -105,7 +142,7 @@ def register_user(db: Session, user_data: UserCreate):
         )
 
     # Hash password and create user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await asyncio.to_thread(get_password_hash, user_data.password)
     username = getattr(user_data, "username", None)
     user = create_user(db, user_data.email, hashed_password, username)
 
@@ -121,10 +158,15 @@ def authenticate_oauth_user(db: Session, oauth_provider: str, oauth_id: str):
 
 
 def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db),
 ):
-    """Get current authenticated user"""
+    """Get current authenticated user (resolved once per request, kept on request.state)"""
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        return user
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -145,6 +187,7 @@ def get_current_user(
     if user is None:
         raise credentials_exception
 
+    request.state.user = user
     return user
 
 
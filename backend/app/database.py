@@ -2,10 +2,15 @@
 Database configuration and models for StudentsAI MVP
 """
 
+import io
+import logging
+import threading
 import uuid
 from datetime import datetime, timezone, timedelta
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple, Callable
 
+from cachetools import TTLCache
+from fastapi import Depends
 from sqlalchemy import (
     create_engine,
     Column,
@@ -14,32 +19,162 @@ from sqlalchemy import (
     DateTime,
     Date,
     Integer,
+    SmallInteger,
     ForeignKey,
     JSON,
     Boolean,
+    Float,
+    event,
+    inspect,
+    any_,
+    bindparam,
+    case,
+    cast,
+    insert,
+    lambda_stmt,
+    literal,
+    select,
+    update,
 )
-from sqlalchemy.dialects.postgresql import UUID, ARRAY
+from sqlalchemy.dialects.postgresql import (
+    UUID,
+    ARRAY,
+    ENUM,
+    JSONB,
+    insert as pg_insert,
+)
+from sqlalchemy.exc import DataError, IntegrityError, OperationalError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session, relationship
+from sqlalchemy.pool import NullPool
+from sqlalchemy.orm import (
+    sessionmaker,
+    Session,
+    relationship,
+    defer,
+    selectinload,
+    raiseload,
+    make_transient_to_detached,
+)
 from sqlalchemy.sql import func
 from sqlalchemy import text as sql_text
 from sqlalchemy import or_
 
-from .config import DATABASE_URL
+from .config import (
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    DB_POOL_TIMEOUT,
+    DB_POOL_USE_LIFO,
+    DB_STATEMENT_TIMEOUT_MS,
+    DB_USE_NULL_POOL,
+    DB_STRICT_LOADING,
+    DATABASE_URL_RO,
+    DB_RO_POOL_SIZE,
+    ENVIRONMENT,
+)
+
+logger = logging.getLogger(__name__)
 
 REVIEW_TYPES = {"NOTE_REVIEWED", "FLASHCARD_REVIEWED"}
 
+
+def _utcnow() -> datetime:
+    """Timezone-aware current UTC time (matches the TIMESTAMPTZ columns)"""
+    return datetime.now(timezone.utc)
+
+
+# Rows per multi-row INSERT for bulk writes
+BULK_INSERT_BATCH_SIZE = 1000
+
+# TCP keepalives so idle pooled connections aren't silently dropped
+_PG_CONNECT_ARGS = {
+    "keepalives": 1,
+    "keepalives_idle": 30,
+    "keepalives_interval": 10,
+    "keepalives_count": 5,
+}
+# Server-side cap on any single statement, so a runaway query can't hold a
+# pooled connection indefinitely. PgBouncer rejects startup options in
+# transaction mode, so behind it the timeout is left to the server config.
+if DB_STATEMENT_TIMEOUT_MS and not DB_USE_NULL_POOL:
+    _PG_CONNECT_ARGS["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+
+
+def _pool_kwargs(pool_size: int) -> Dict[str, Any]:
+    """create_engine pooling arguments from the DB_* settings"""
+    if DB_USE_NULL_POOL:
+        # PgBouncer (transaction pooling) owns the pooling; a client-side pool
+        # and its pre-ping SELECT 1 would only pin server connections
+        return {"poolclass": NullPool}
+    return {
+        "pool_size": pool_size,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        # LIFO keeps a small hot set in use under light load and lets the
+        # rest sit idle until pool_recycle retires them
+        "pool_use_lifo": DB_POOL_USE_LIFO,
+    }
+
+
 # Database engine and session
-engine = create_engine(DATABASE_URL, echo=False)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Compiled-SQL LRU per engine. The lambda_stmt getters and their loader
+# option variants add up to more distinct statements than the 500 default.
+QUERY_CACHE_SIZE = 1200
+
+engine = create_engine(
+    DATABASE_URL,
+    echo=False,
+    query_cache_size=QUERY_CACHE_SIZE,
+    **_pool_kwargs(DB_POOL_SIZE),
+    # psycopg2 fast paths: multi-row VALUES for INSERT executemany and
+    # execute_batch() for UPDATE/DELETE executemany
+    executemany_mode="values_plus_batch",
+    insertmanyvalues_page_size=BULK_INSERT_BATCH_SIZE,
+    executemany_batch_page_size=500,
+    connect_args=_PG_CONNECT_ARGS,
+)
+# Objects stay loaded across commit: write helpers that need fresh server
+# values get them from RETURNING (eager_defaults) instead of a re-SELECT.
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+)
+
+# Read-only endpoints (lists, graph, stats) go to a replica when
+# DATABASE_URL_RO is set, on their own pool; without one they share the
+# primary engine. Single-note fetches and anything that can follow a write in
+# the same user flow stay on the primary for read-your-writes.
+if DATABASE_URL_RO:
+    read_engine = create_engine(
+        DATABASE_URL_RO,
+        echo=False,
+        query_cache_size=QUERY_CACHE_SIZE,
+        **_pool_kwargs(DB_RO_POOL_SIZE),
+        connect_args=_PG_CONNECT_ARGS,
+    )
+else:
+    read_engine = engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 Base = declarative_base()
 
+# Child -> parent relationships are never traversed by the app (callers use
+# the *_id columns); in strict mode an accidental lazy load raises instead of
+# quietly costing a SELECT per row.
+_PARENT_LAZY = "raise" if DB_STRICT_LOADING else "select"
+
+# Fetch server-generated created_at/updated_at in the INSERT/UPDATE itself
+_EAGER_DEFAULTS = {"eager_defaults": True}
+
 
 # Database models
 class User(Base):
     """User model for authentication"""
 
     __tablename__ = "users"
+    __mapper_args__ = _EAGER_DEFAULTS
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     email = Column(String(255), unique=True, index=True, nullable=False)
@@ -92,6 +227,7 @@ class Note(Base):
     """Note model for storing user notes"""
 
     __tablename__ = "notes"
+    __mapper_args__ = _EAGER_DEFAULTS
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title = Column(String(500), nullable=False)
@@ -102,13 +238,13 @@ class Note(Base):
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
     # Tags for keywords
-    tags = Column(ARRAY(String), nullable=True, default=list)
+    tags = Column(ARRAY(String), nullable=False, server_default="{}")
 
     # Foreign key
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
 
     # Relationships
-    user = relationship("User", back_populates="notes")
+    user = relationship("User", back_populates="notes", lazy=_PARENT_LAZY)
     flashcards = relationship(
         "Flashcard", back_populates="note", cascade="all, delete-orphan"
     )
@@ -138,21 +274,33 @@ class NoteSimilarity(Base):
 
     __tablename__ = "note_similarities"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    note_a_id = Column(
-        UUID(as_uuid=True), ForeignKey("notes.id"), nullable=False, index=True
-    )
+    # The ordered pair is the natural key; note_a_id lookups use the PK
+    note_a_id = Column(UUID(as_uuid=True), ForeignKey("notes.id"), primary_key=True)
     note_b_id = Column(
-        UUID(as_uuid=True), ForeignKey("notes.id"), nullable=False, index=True
+        UUID(as_uuid=True), ForeignKey("notes.id"), primary_key=True, index=True
     )
     similarity = Column(
-        Integer, nullable=False
+        SmallInteger, nullable=False
     )  # store as int 0..1000 (similarity*1000) for stability
     updated_at = Column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
 
 
+# Every event type the app records, stored as the Postgres enum event_kind
+# (4 bytes, compared as integers). A new type needs ALTER TYPE event_kind
+# ADD VALUE before it is recorded.
+EVENT_TYPES = (
+    "NOTE_CREATED",
+    "NOTE_REVIEWED",
+    "NOTE_UPDATED",
+    "FLASHCARD_CREATED",
+    "FLASHCARD_REVIEWED",
+    "FLASHCARD_UPDATED",
+    "FLASHCARD_TAGGED",
+)
+
+
 class Event(Base):
     """User activity events used for stats and heatmaps.
 
@@ -162,10 +310,11 @@ class Event(Base):
     __tablename__ = "events"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(
-        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True
+    # user_id lookups use the composite idx_events_user_* indexes
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    event_type = Column(
+        ENUM(*EVENT_TYPES, name="event_kind"), nullable=False, index=True
     )
-    event_type = Column(String(50), nullable=False, index=True)
     occurred_at = Column(
         DateTime(timezone=True), nullable=False, index=True, server_default=func.now()
     )
@@ -177,22 +326,23 @@ class Flashcard(Base):
     """Enhanced flashcard model for spaced repetition and contextual learning"""
 
     __tablename__ = "flashcards"
+    __mapper_args__ = _EAGER_DEFAULTS
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     question = Column(Text, nullable=False)
     answer = Column(Text, nullable=False)
-    difficulty = Column(Integer, default=1)  # 1-5 scale
+    difficulty = Column(SmallInteger, default=1)  # 1-5 scale
     last_reviewed = Column(DateTime(timezone=True), nullable=True)
     next_review = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # New fields for enhanced functionality
     tags = Column(
-        ARRAY(String), nullable=True, default=list
+        ARRAY(String), nullable=False, server_default="{}"
     )  # e.g., ["visit_later", "revisited", "recently_learned"]
     review_count = Column(Integer, default=0)  # How many times reviewed
-    mastery_level = Column(Integer, default=0)  # 0-100, calculated from performance
-    last_performance = Column(Integer, nullable=True)  # Last review score (0-100)
+    mastery_level = Column(SmallInteger, default=0)  # 0-100, calculated from performance
+    last_performance = Column(SmallInteger, nullable=True)  # Last review score (0-100)
     flashcard_type = Column(
         String(50), default="single_note"
     )  # "single_note" or "contextual"
@@ -200,8 +350,8 @@ class Flashcard(Base):
         ARRAY(UUID(as_uuid=True)), nullable=True
     )  # For contextual flashcards
     user_answer_history = Column(
-        JSON, nullable=True
-    )  # Store recent user answers for analysis
+        JSONB, nullable=True
+    )  # Last 10 answers, oldest first: [{"ts", "answer", "score", "mastery"}]
 
     # Foreign key
     note_id = Column(UUID(as_uuid=True), ForeignKey("notes.id"), nullable=False)
@@ -210,8 +360,8 @@ class Flashcard(Base):
     )  # Direct user association
 
     # Relationships
-    note = relationship("Note", back_populates="flashcards")
-    user = relationship("User", back_populates="flashcards")
+    note = relationship("Note", back_populates="flashcards", lazy=_PARENT_LAZY)
+    user = relationship("User", back_populates="flashcards", lazy=_PARENT_LAZY)
 
 
 class FlashcardSRS(Base):
@@ -264,11 +414,11 @@ class FlashcardReview(Base):
     )
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     typed_answer = Column(Text, nullable=False)
-    ai_score = Column(Integer, nullable=True)  # 0-100 score from LLM
+    ai_score = Column(SmallInteger, nullable=True)  # 0-100 score from LLM
     verdict = Column(String(20), nullable=True)  # 'correct', 'partial', 'incorrect'
     feedback = Column(Text, nullable=True)
     missing_points = Column(ARRAY(String), nullable=True)
-    confidence = Column(Integer, nullable=True)  # 0-100 confidence from LLM
+    confidence = Column(SmallInteger, nullable=True)  # 0-100 confidence from LLM
     reviewed_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
@@ -291,6 +441,12 @@ class ActivityDaily(Base):
     count = Column(Integer, nullable=False, default=0)
 
 
+def _any_of(values, item_type):
+    """`= ANY(:array)` operand: a single array parameter, so the statement text
+    (and its cached plan) is the same however many values are passed."""
+    return any_(bindparam(None, list(values), type_=ARRAY(item_type)))
+
+
 # Database dependency
 def get_db() -> Session:
     """Get database session"""
@@ -301,81 +457,237 @@ def get_db() -> Session:
         db.close()
 
 
+def get_read_db(db: Session = Depends(get_db)) -> Session:
+    """Get a session for read-only queries (replica if configured).
+
+    Without a replica this is the request's get_db session, which
+    get_current_user has already opened, so a request holds one session.
+    """
+    if read_engine is engine:
+        yield db
+        return
+    read_db = ReadSessionLocal()
+    try:
+        yield read_db
+    finally:
+        read_db.close()
+
+
+# Schema patch-ups on top of create_all, as one script in one transaction.
+# create_tables applies it on every development start. Other environments got
+# a frozen copy through the apply_schema_script Alembic revision; later changes
+# here need their own revision.
+# activity_daily is maintained by a trigger on events: every insert bumps the
+# "all" row for its UTC day plus the "notes"/"flashcards" row for its type;
+# when the trigger is first added, activity_daily is rebuilt from events.
+_DEV_SCHEMA_SQL = """
+-- Columns added after the initial schema
+ALTER TABLE users ADD COLUMN IF NOT EXISTS username VARCHAR(50);
+ALTER TABLE notes ADD COLUMN IF NOT EXISTS tags TEXT[] NOT NULL DEFAULT '{}';
+-- Tag arrays default to empty server-side rather than NULL
+UPDATE notes SET tags = '{}' WHERE tags IS NULL;
+ALTER TABLE notes ALTER COLUMN tags SET DEFAULT '{}', ALTER COLUMN tags SET NOT NULL;
+UPDATE flashcards SET tags = '{}' WHERE tags IS NULL;
+ALTER TABLE flashcards
+  ALTER COLUMN tags SET DEFAULT '{}', ALTER COLUMN tags SET NOT NULL;
+
+-- Events; event_type is the event_kind enum (see EVENT_TYPES)
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = 'event_kind') THEN
+    CREATE TYPE event_kind AS ENUM (
+      'NOTE_CREATED', 'NOTE_REVIEWED', 'NOTE_UPDATED',
+      'FLASHCARD_CREATED', 'FLASHCARD_REVIEWED', 'FLASHCARD_UPDATED',
+      'FLASHCARD_TAGGED'
+    );
+  END IF;
+END
+$$;
+CREATE TABLE IF NOT EXISTS events (
+  id UUID PRIMARY KEY,
+  user_id UUID NOT NULL,
+  event_type event_kind NOT NULL,
+  occurred_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  target_id UUID NULL,
+  metadata JSON NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_type ON events(event_type);
+CREATE INDEX IF NOT EXISTS idx_events_occurred ON events(occurred_at);
+CREATE INDEX IF NOT EXISTS idx_events_user_day ON events(user_id, occurred_at DESC);
+CREATE INDEX IF NOT EXISTS idx_events_user_type_day ON events(user_id, event_type, occurred_at DESC);
+CREATE INDEX IF NOT EXISTS brin_events_occurred ON events USING BRIN (occurred_at);
+-- Older tables stored event_type as VARCHAR; convert unless a row holds a
+-- type outside the enum
+DO $$
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_name = 'events' AND column_name = 'event_type'
+      AND udt_name <> 'event_kind'
+  ) THEN
+    ALTER TABLE events
+      ALTER COLUMN event_type TYPE event_kind USING event_type::event_kind;
+  END IF;
+EXCEPTION WHEN invalid_text_representation THEN
+  RAISE NOTICE 'events.event_type has unknown values; left as VARCHAR';
+END
+$$;
+-- user_id alone is a prefix of the composite indexes above
+DROP INDEX IF EXISTS idx_events_user;
+DROP INDEX IF EXISTS ix_events_user_id;
+
+-- Answer history is a JSONB array, oldest first; older rows were JSON
+-- objects keyed by timestamp
+DO $$
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_name = 'flashcards' AND column_name = 'user_answer_history'
+      AND data_type <> 'jsonb'
+  ) THEN
+    ALTER TABLE flashcards
+      ALTER COLUMN user_answer_history TYPE JSONB USING user_answer_history::jsonb;
+  END IF;
+END
+$$;
+UPDATE flashcards SET user_answer_history = (
+  SELECT COALESCE(jsonb_agg(e.value || jsonb_build_object('ts', e.key) ORDER BY e.key), '[]'::jsonb)
+  FROM jsonb_each(user_answer_history) e
+)
+WHERE jsonb_typeof(user_answer_history) = 'object';
+
+-- Per-user lists in the order they are read: notes newest first, flashcards
+-- by next review (unscheduled last) then newest
+CREATE INDEX IF NOT EXISTS idx_notes_user_created ON notes(user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_flashcards_user_review
+  ON flashcards(user_id, next_review NULLS LAST, created_at DESC);
+-- SRS queue: due cards per user, earliest first
+CREATE INDEX IF NOT EXISTS idx_flashcard_srs_user_due ON flashcard_srs(user_id, due_date);
+
+-- Similarities: keyed by the ordered pair, score as 0..1000 smallint.
+-- Older tables had a surrogate UUID id and an INTEGER score; convert them.
+CREATE TABLE IF NOT EXISTS note_similarities (
+  note_a_id UUID NOT NULL,
+  note_b_id UUID NOT NULL,
+  similarity SMALLINT NOT NULL,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (note_a_id, note_b_id)
+);
+ALTER TABLE note_similarities ALTER COLUMN similarity TYPE SMALLINT;
+ALTER TABLE note_similarities DROP COLUMN IF EXISTS id;
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_constraint
+    WHERE conrelid = 'note_similarities'::regclass AND contype = 'p'
+  ) THEN
+    ALTER TABLE note_similarities ADD PRIMARY KEY (note_a_id, note_b_id);
+  END IF;
+END
+$$;
+DROP INDEX IF EXISTS uq_note_similarity_pair;
+DROP INDEX IF EXISTS idx_sim_a;
+DROP INDEX IF EXISTS ix_note_similarities_note_a_id;
+CREATE INDEX IF NOT EXISTS idx_sim_b ON note_similarities(note_b_id);
+
+-- 0-100 review scores fit in two bytes (flashcard_reviews is not under Alembic)
+ALTER TABLE flashcard_reviews ALTER COLUMN ai_score TYPE SMALLINT;
+ALTER TABLE flashcard_reviews ALTER COLUMN confidence TYPE SMALLINT;
+
+-- Tag filters (overlap / contains) on flashcards
+CREATE INDEX IF NOT EXISTS idx_flashcards_tags_gin ON flashcards USING GIN (tags);
+
+-- Substring search on flashcards (ILIKE '%term%') via trigram indexes; the
+-- extension needs CREATE privilege, so skip the indexes when it's missing
+DO $$
+BEGIN
+  CREATE EXTENSION IF NOT EXISTS pg_trgm;
+EXCEPTION WHEN insufficient_privilege THEN
+  RAISE NOTICE 'pg_trgm unavailable, skipping trigram indexes';
+END
+$$;
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+    CREATE INDEX IF NOT EXISTS idx_flashcards_q_trgm
+      ON flashcards USING GIN (question gin_trgm_ops);
+    CREATE INDEX IF NOT EXISTS idx_flashcards_a_trgm
+      ON flashcards USING GIN (answer gin_trgm_ops);
+  END IF;
+END
+$$;
+
+-- Backlink lookups filter on to_note_id and read from_note_id
+CREATE INDEX IF NOT EXISTS idx_notelinks_to_from ON note_links(to_note_id, from_note_id);
+
+-- Activity daily aggregate; reads filter user + kind and range over day,
+-- and the covering count keeps them index-only
+CREATE TABLE IF NOT EXISTS activity_daily (
+  user_id UUID NOT NULL,
+  day DATE NOT NULL,
+  kind VARCHAR(16) NOT NULL,
+  count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY(user_id, day, kind)
+);
+CREATE INDEX IF NOT EXISTS idx_activity_daily_user_kind_day
+  ON activity_daily(user_id, kind, day) INCLUDE (count);
+
+CREATE OR REPLACE FUNCTION bump_activity_daily() RETURNS trigger AS $$
+DECLARE
+  d date := DATE(NEW.occurred_at AT TIME ZONE 'UTC');
+  k text := CASE
+    WHEN NEW.event_type IN ('NOTE_CREATED', 'NOTE_REVIEWED') THEN 'notes'
+    WHEN NEW.event_type IN ('FLASHCARD_CREATED', 'FLASHCARD_REVIEWED') THEN 'flashcards'
+  END;
+BEGIN
+  INSERT INTO activity_daily (user_id, day, kind, count)
+  VALUES (NEW.user_id, d, 'all', 1)
+  ON CONFLICT (user_id, day, kind) DO UPDATE SET count = activity_daily.count + 1;
+  IF k IS NOT NULL THEN
+    INSERT INTO activity_daily (user_id, day, kind, count)
+    VALUES (NEW.user_id, d, k, 1)
+    ON CONFLICT (user_id, day, kind) DO UPDATE SET count = activity_daily.count + 1;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'events_ai') THEN
+    CREATE TRIGGER events_ai AFTER INSERT ON events
+      FOR EACH ROW EXECUTE FUNCTION bump_activity_daily();
+
+    INSERT INTO activity_daily (user_id, day, kind, count)
+    SELECT e.user_id, DATE(e.occurred_at AT TIME ZONE 'UTC'), k.kind, COUNT(*)
+    FROM events e
+    CROSS JOIN LATERAL (
+      VALUES ('all'),
+             (CASE
+                WHEN e.event_type IN ('NOTE_CREATED', 'NOTE_REVIEWED') THEN 'notes'
+                WHEN e.event_type IN ('FLASHCARD_CREATED', 'FLASHCARD_REVIEWED') THEN 'flashcards'
+              END)
+    ) AS k(kind)
+    WHERE k.kind IS NOT NULL
+    GROUP BY 1, 2, 3
+    ON CONFLICT (user_id, day, kind) DO UPDATE SET count = EXCLUDED.count;
+  END IF;
+END
+$$;
+"""
+
+
 # Database initialization
 def create_tables():
-    """Create all database tables"""
+    """Create any missing tables; in development also apply _DEV_SCHEMA_SQL"""
     Base.metadata.create_all(bind=engine)
-    # Ensure new columns exist in dev without full migration
+    # Outside development the script is a migration, not a startup cost
+    if ENVIRONMENT != "development":
+        return
+    # Ensure new columns/indexes exist in dev without full migration
     try:
-        with engine.connect() as conn:
-            # Add username column if missing (PostgreSQL)
-            conn.execute(
-                sql_text(
-                    "ALTER TABLE users ADD COLUMN IF NOT EXISTS username VARCHAR(50)"
-                )
-            )
-            # Add tags column if missing (PostgreSQL)
-            conn.execute(
-                sql_text("ALTER TABLE notes ADD COLUMN IF NOT EXISTS tags TEXT[]")
-            )
-            # Create events table if missing (dev convenience; use Alembic in prod)
-            conn.execute(
-                sql_text(
-                    """
-                CREATE TABLE IF NOT EXISTS events (
-                  id UUID PRIMARY KEY,
-                  user_id UUID NOT NULL,
-                  event_type VARCHAR(50) NOT NULL,
-                  occurred_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                  target_id UUID NULL,
-                  metadata JSON NULL
-                );
-                CREATE INDEX IF NOT EXISTS idx_events_user ON events(user_id);
-                CREATE INDEX IF NOT EXISTS idx_events_type ON events(event_type);
-                CREATE INDEX IF NOT EXISTS idx_events_occurred ON events(occurred_at);
-                """
-                )
-            )
-            # Similarities table (dev convenience)
-            conn.execute(
-                sql_text(
-                    """
-                    CREATE TABLE IF NOT EXISTS note_similarities (
-                      id UUID PRIMARY KEY,
-                      note_a_id UUID NOT NULL,
-                      note_b_id UUID NOT NULL,
-                      similarity INTEGER NOT NULL,
-                      updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-                    );
-                    CREATE INDEX IF NOT EXISTS idx_sim_a ON note_similarities(note_a_id);
-                    CREATE INDEX IF NOT EXISTS idx_sim_b ON note_similarities(note_b_id);
-                    """
-                )
-            )
-            # Activity daily aggregate (dev convenience)
-            conn.execute(
-                sql_text(
-                    """
-                    CREATE TABLE IF NOT EXISTS activity_daily (
-                      user_id UUID NOT NULL,
-                      day DATE NOT NULL,
-                      kind VARCHAR(16) NOT NULL,
-                      count INTEGER NOT NULL DEFAULT 0,
-                      PRIMARY KEY(user_id, day, kind)
-                    );
-                    """
-                )
-            )
-            # Helpful composite indexes for events queries
-            conn.execute(
-                Text(
-                    """
-                    CREATE INDEX IF NOT EXISTS idx_events_user_day ON events(user_id, occurred_at DESC);
-                    CREATE INDEX IF NOT EXISTS idx_events_user_type_day ON events(user_id, event_type, occurred_at DESC);
-                    """
-                )
-            )
-            conn.commit()
+        with engine.begin() as conn:
+            conn.exec_driver_sql(_DEV_SCHEMA_SQL)
     except Exception:
         # Best-effort; ignore if not supported or already present
         pass
@@ -386,15 +698,94 @@ def drop_tables():
     Base.metadata.drop_all(bind=engine)
 
 
+# User lookups are on every authenticated request. Detached copies of recently
+# loaded users are cached briefly and merged into the caller's session without
+# a SELECT; a user changed or deleted in a flush is dropped then and again
+# once the transaction commits. The snapshot leaves out password_hash, so
+# anything that reads it loads it from the database, and login never goes
+# through the cache.
+_user_cache = TTLCache(maxsize=10_000, ttl=60)
+_user_id_by_email = TTLCache(maxsize=10_000, ttl=60)
+_user_cache_lock = threading.Lock()
+_UNCACHED_USER_ATTRS = {"password_hash"}
+
+
+def _cache_user(user: User) -> None:
+    snapshot = User(
+        **{
+            attr.key: getattr(user, attr.key)
+            for attr in inspect(User).column_attrs
+            if attr.key not in _UNCACHED_USER_ATTRS
+        }
+    )
+    make_transient_to_detached(snapshot)
+    with _user_cache_lock:
+        _user_cache[user.id] = snapshot
+        _user_id_by_email[user.email] = user.id
+
+
+def _cached_user(db: Session, user_id: uuid.UUID) -> Optional[User]:
+    with _user_cache_lock:
+        snapshot = _user_cache.get(user_id)
+    if snapshot is None:
+        return None
+    return db.merge(snapshot, load=False)
+
+
+def invalidate_user_cache(user_id: uuid.UUID) -> None:
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _invalidate_flushed_users(session, flush_context):
+    flushed = session.info.setdefault("flushed_user_ids", set())
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            invalidate_user_cache(obj.id)
+            flushed.add(obj.id)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidate_committed_users(session):
+    # A request that read the user between the flush and the commit may have
+    # cached the old row again
+    for user_id in session.info.pop("flushed_user_ids", ()):
+        invalidate_user_cache(user_id)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_flushed_users(session):
+    session.info.pop("flushed_user_ids", None)
+
+
 # Database utilities
-def get_user_by_email(db: Session, email: str) -> Optional[User]:
-    """Get user by email"""
-    return db.query(User).filter(User.email == email).first()
+def get_user_by_email(db: Session, email: str, cached: bool = True) -> Optional[User]:
+    """Get user by email (cached=False always reads the database, e.g. to
+    check credentials)"""
+    with _user_cache_lock:
+        user_id = _user_id_by_email.get(email) if cached else None
+    if user_id is not None:
+        user = _cached_user(db, user_id)
+        if user is not None and user.email == email:
+            return user
+    stmt = lambda_stmt(lambda: select(User).where(User.email == email))
+    user = db.execute(stmt).scalars().first()
+    if user is not None:
+        _cache_user(user)
+    return user
 
 
 def get_user_by_id(db: Session, user_id: uuid.UUID) -> Optional[User]:
     """Get user by ID"""
-    return db.query(User).filter(User.id == user_id).first()
+    user = _cached_user(db, user_id)
+    if user is not None:
+        return user
+    # Primary-key get: no SELECT if the user is already in this session
+    user = db.get(User, user_id)
+    if user is not None:
+        _cache_user(user)
+    return user
 
 
 def create_user(
@@ -406,27 +797,30 @@ def create_user(
     oauth_id: str = None,
 ) -> User:
     """Create new user (supports both password and OAuth)"""
-    if username is None:
-        # Generate a unique username if none provided
-        import uuid
-
-        base_username = f"user_{str(uuid.uuid4())[:8]}"
-        username = base_username
-        counter = 1
-        while get_user_by_username(db, username):
-            username = f"{base_username}_{counter}"
-            counter += 1
-
-    user = User(
-        email=email,
-        username=username,
-        password_hash=password_hash,
-        oauth_provider=oauth_provider,
-        oauth_id=oauth_id,
-    )
-    db.add(user)
+    # Without an explicit username, generate one and let the unique index
+    # arbitrate: ON CONFLICT DO NOTHING returns no row on a clash, and we retry
+    # with a suffix. An explicit username that clashes still raises.
+    generate = username is None
+    base_username = username or f"user_{str(uuid.uuid4())[:8]}"
+    candidate = base_username
+    counter = 0
+    while True:
+        stmt = pg_insert(User).values(
+            email=email,
+            username=candidate,
+            password_hash=password_hash,
+            oauth_provider=oauth_provider,
+            oauth_id=oauth_id,
+        )
+        if generate:
+            stmt = stmt.on_conflict_do_nothing(index_elements=["username"])
+        user = db.scalars(stmt.returning(User)).first()
+        if user is not None:
+            break
+        counter += 1
+        candidate = f"{base_username}_{counter}"
+
     db.commit()
-    db.refresh(user)
     return user
 
 
@@ -478,7 +872,8 @@ def create_or_get_oauth_user(
 
 def get_user_by_username(db: Session, username: str) -> Optional[User]:
     """Get user by username"""
-    return db.query(User).filter(User.username == username).first()
+    stmt = lambda_stmt(lambda: select(User).where(User.username == username))
+    return db.execute(stmt).scalars().first()
 
 
 def update_user_profile(db: Session, user_id: uuid.UUID, **kwargs) -> Optional[User]:
@@ -491,17 +886,83 @@ def update_user_profile(db: Session, user_id: uuid.UUID, **kwargs) -> Optional[U
         if hasattr(user, field):
             setattr(user, field, value)
 
-    user.updated_at = datetime.now(timezone.utc)
+    # updated_at is stamped by the database (onupdate=now()) and returned by
+    # the UPDATE itself (eager_defaults)
     db.commit()
     db.refresh(user)
     return user
 
 
-def get_notes_by_user(db: Session, user_id: uuid.UUID, skip: int = 0, limit: int = 100):
-    """Get notes for a user"""
-    return (
-        db.query(Note).filter(Note.user_id == user_id).offset(skip).limit(limit).all()
+def _with_note_loading(stmt, with_flashcards: bool, strict: bool):
+    """Declare relationship loading up front on a Note lambda statement"""
+    if with_flashcards:
+        stmt += lambda s: s.options(selectinload(Note.flashcards))
+    if strict:
+        stmt += lambda s: s.options(raiseload("*"))
+    return stmt
+
+
+def get_notes_by_user(
+    db: Session,
+    user_id: uuid.UUID,
+    skip: int = 0,
+    limit: int = 100,
+    with_flashcards: bool = False,
+    strict: bool = DB_STRICT_LOADING,
+):
+    """Get notes for a user.
+
+    with_flashcards eager-loads Note.flashcards in one extra IN query instead
+    of a lazy SELECT per note. strict makes any other relationship access on
+    the results raise instead of lazy loading.
+    """
+    stmt = lambda_stmt(
+        lambda: select(Note)
+        .where(Note.user_id == user_id)
+        .order_by(Note.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+    )
+    stmt = _with_note_loading(stmt, with_flashcards, strict)
+    return db.execute(stmt).scalars().all()
+
+
+# Rows per fetch when streaming a user's notes through a server-side cursor
+NOTE_STREAM_BATCH_SIZE = 200
+
+
+def iter_notes_by_user(
+    db: Session,
+    user_id: uuid.UUID,
+    with_flashcards: bool = False,
+    strict: bool = DB_STRICT_LOADING,
+):
+    """Yield all of a user's notes, newest first, NOTE_STREAM_BATCH_SIZE at a
+    time, so memory is bounded by the batch rather than the note count
+    (with_flashcards eager-loads per batch)."""
+    stmt = lambda_stmt(
+        lambda: select(Note)
+        .where(Note.user_id == user_id)
+        .order_by(Note.created_at.desc())
+    )
+    stmt = _with_note_loading(stmt, with_flashcards, strict)
+    result = db.execute(stmt, execution_options={"yield_per": NOTE_STREAM_BATCH_SIZE})
+    yield from result.scalars()
+
+
+def get_note_rows_by_user(
+    db: Session, user_id: uuid.UUID, skip: int = 0, limit: int = 100
+):
+    """(id, title, content, created_at) rows for a user's notes, in the same
+    order as get_notes_by_user, without building ORM objects"""
+    stmt = lambda_stmt(
+        lambda: select(Note.id, Note.title, Note.content, Note.created_at)
+        .where(Note.user_id == user_id)
+        .order_by(Note.created_at.desc())
+        .offset(skip)
+        .limit(limit)
     )
+    return db.execute(stmt).all()
 
 
 def get_notes_by_titles(
@@ -513,31 +974,52 @@ def get_notes_by_titles(
     return (
         db.query(Note)
         .filter(Note.user_id == user_id)
-        .filter(Note.title.in_(titles))
+        .filter(Note.title == _any_of(titles, String))
         .all()
     )
 
 
 def get_note_by_id(
-    db: Session, note_id: uuid.UUID, user_id: uuid.UUID
+    db: Session,
+    note_id: uuid.UUID,
+    user_id: uuid.UUID,
+    with_flashcards: bool = False,
+    strict: bool = DB_STRICT_LOADING,
 ) -> Optional[Note]:
     """Get note by ID for a specific user"""
-    return db.query(Note).filter(Note.id == note_id, Note.user_id == user_id).first()
+    stmt = lambda_stmt(
+        lambda: select(Note).where(Note.id == note_id, Note.user_id == user_id)
+    )
+    stmt = _with_note_loading(stmt, with_flashcards, strict)
+    return db.execute(stmt).scalars().first()
+
 
+def create_note(
+    db: Session, title: str, content: str, user_id: uuid.UUID, commit: bool = True
+) -> Note:
+    """Create new note.
 
-def create_note(db: Session, title: str, content: str, user_id: uuid.UUID) -> Note:
-    """Create new note"""
+    commit=False only flushes, leaving the transaction to the caller so that
+    several helpers can share one commit.
+    """
     note = Note(title=title, content=content, user_id=user_id)
     db.add(note)
-    db.commit()
-    db.refresh(note)
+    if commit:
+        db.commit()
+    else:
+        db.flush()
     return note
 
 
 def update_note(
-    db: Session, note: Note, title: str = None, content: str = None, summary: str = None
+    db: Session,
+    note: Note,
+    title: str = None,
+    content: str = None,
+    summary: str = None,
+    commit: bool = True,
 ) -> Note:
-    """Update existing note"""
+    """Update existing note (commit=False flushes only, as in create_note)"""
     if title is not None:
         note.title = title
     if content is not None:
@@ -546,36 +1028,46 @@ def update_note(
         note.summary = summary
     # Tags update handled via separate helper to avoid accidental wipes
 
-    note.updated_at = datetime.now(timezone.utc)
-    db.commit()
-    db.refresh(note)
+    # updated_at comes from onupdate=now() via RETURNING, as in update_user_profile
+    if commit:
+        db.commit()
+    else:
+        db.flush()
     return note
 
 
 def delete_note(db: Session, note: Note):
     """Delete note and all related data"""
     try:
-        # First delete related flashcards and their SRS data
-        flashcards = db.query(Flashcard).filter(Flashcard.note_id == note.id).all()
-        for flashcard in flashcards:
-            # Delete SRS data first
-            db.query(FlashcardSRS).filter(FlashcardSRS.flashcard_id == flashcard.id).delete()
-            # Delete the flashcard
-            db.delete(flashcard)
+        # First delete related flashcards and their SRS/review rows, as set
+        # deletes keyed on the note rather than one round-trip per card
+        flashcard_ids = select(Flashcard.id).where(Flashcard.note_id == note.id)
+        db.query(FlashcardSRS).filter(
+            FlashcardSRS.flashcard_id.in_(flashcard_ids)
+        ).delete(synchronize_session=False)
+        db.query(FlashcardReview).filter(
+            FlashcardReview.flashcard_id.in_(flashcard_ids)
+        ).delete(synchronize_session=False)
+        db.query(Flashcard).filter(Flashcard.note_id == note.id).delete(
+            synchronize_session=False
+        )
         
         # Delete note similarities
         db.query(NoteSimilarity).filter(
             (NoteSimilarity.note_a_id == note.id) | (NoteSimilarity.note_b_id == note.id)
-        ).delete()
+        ).delete(synchronize_session=False)
         
         # Delete note links
         db.query(NoteLink).filter(
             (NoteLink.from_note_id == note.id) | (NoteLink.to_note_id == note.id)
-        ).delete()
+        ).delete(synchronize_session=False)
         
-        # Finally delete the note
-        db.delete(note)
+        # Finally delete the note; bypass the ORM cascade on Note.flashcards,
+        # which would otherwise reload the (already deleted) cards
+        db.query(Note).filter(Note.id == note.id).delete(synchronize_session=False)
+        db.expunge(note)
         db.commit()
+        invalidate_due_cache(note.user_id)
         
     except Exception as e:
         db.rollback()
@@ -584,7 +1076,8 @@ def delete_note(db: Session, note: Note):
 
 def get_flashcards_by_note(db: Session, note_id: uuid.UUID):
     """Get flashcards for a note"""
-    return db.query(Flashcard).filter(Flashcard.note_id == note_id).all()
+    stmt = lambda_stmt(lambda: select(Flashcard).where(Flashcard.note_id == note_id))
+    return db.execute(stmt).scalars().all()
 
 
 def create_flashcard(
@@ -594,8 +1087,9 @@ def create_flashcard(
     note_id: uuid.UUID,
     user_id: uuid.UUID,
     flashcard_type: str = "single_note",
+    commit: bool = True,
 ) -> Flashcard:
-    """Create new flashcard"""
+    """Create new flashcard (commit=False flushes only, as in create_note)"""
     flashcard = Flashcard(
         question=question,
         answer=answer,
@@ -604,12 +1098,102 @@ def create_flashcard(
         flashcard_type=flashcard_type,
     )
     db.add(flashcard)
-    db.commit()
-    db.refresh(flashcard)
+    if commit:
+        db.commit()
+    else:
+        db.flush()
     return flashcard
 
 
+def create_flashcards_bulk(
+    db: Session,
+    cards: List[Tuple[str, str]],
+    note_id: uuid.UUID,
+    user_id: uuid.UUID,
+    flashcard_type: str = "single_note",
+) -> List[Flashcard]:
+    """Create flashcards from (question, answer) pairs with one multi-row
+    INSERT and one commit, returned in input order."""
+    rows = [
+        {
+            "question": question,
+            "answer": answer,
+            "note_id": note_id,
+            "user_id": user_id,
+            "flashcard_type": flashcard_type,
+        }
+        for question, answer in cards
+    ]
+    return _insert_flashcards(db, rows)
+
+
+def create_contextual_flashcards_bulk(
+    db: Session,
+    cards: List[Tuple[str, str]],
+    note_id: uuid.UUID,
+    user_id: uuid.UUID,
+    context_notes: List[uuid.UUID],
+) -> List[Flashcard]:
+    """Bulk version of create_contextual_flashcard: one INSERT and one
+    commit for a generated set, returned in input order."""
+    rows = [
+        {
+            "question": question,
+            "answer": answer,
+            "note_id": note_id,
+            "user_id": user_id,
+            "flashcard_type": "contextual",
+            "context_notes": context_notes,
+            "tags": ["contextual"],
+        }
+        for question, answer in cards
+    ]
+    return _insert_flashcards(db, rows)
+
+
+def _insert_flashcards(db: Session, rows: List[Dict[str, Any]]) -> List[Flashcard]:
+    if not rows:
+        return []
+    stmt = insert(Flashcard).returning(Flashcard.id, sort_by_parameter_order=True)
+    ids = db.scalars(stmt, rows).all()
+    db.commit()
+    return _load_flashcards_in_order(db, ids)
+
+
+def _load_flashcards_in_order(db: Session, ids: List[uuid.UUID]) -> List[Flashcard]:
+    """Load flashcards by id in one query, preserving the order of ids"""
+    by_id = {
+        f.id: f
+        for f in db.scalars(
+            select(Flashcard).where(Flashcard.id == _any_of(ids, UUID(as_uuid=True)))
+        )
+    }
+    return [by_id[i] for i in ids]
+
+
 # Event utilities
+# Events are buffered in-process and written in batches: record_event only
+# appends, and flush_events() inserts everything pending in one multi-row
+# INSERT. The app's periodic flush task writes the buffer on an interval and
+# is woken early when it reaches EVENT_FLUSH_SIZE; rows that could not be
+# written because the database was unavailable go back into the buffer,
+# which is capped at EVENT_BUFFER_MAX (oldest rows are dropped, and logged,
+# beyond that).
+EVENT_FLUSH_SIZE = 500
+EVENT_FLUSH_INTERVAL_SECONDS = 1.0
+EVENT_BUFFER_MAX = 10_000
+_event_buffer: List[Dict[str, Any]] = []
+_event_buffer_lock = threading.Lock()
+_event_flush_waker: Optional[Callable[[], None]] = None
+
+
+def set_event_flush_waker(waker: Optional[Callable[[], None]]) -> None:
+    """Register a callback that asks the background flusher to run now.
+    Without one (scripts, tests) a full buffer is flushed inline."""
+    global _event_flush_waker
+    _event_flush_waker = waker
+
+
 def record_event(
     db: Session,
     user_id: uuid.UUID,
@@ -618,19 +1202,106 @@ def record_event(
     metadata: Optional[Dict[str, Any]] = None,
     occurred_at: Optional[datetime] = None,
 ):
-    from .database import Event  # local import to avoid circular in type hints
+    """Queue an event for the next batched write (db is kept for API
+    compatibility; the write happens on its own connection).
 
-    ts = occurred_at or datetime.now(timezone.utc)
-    event = Event(
-        user_id=user_id,
-        event_type=event_type,
-        occurred_at=ts,
-        target_id=target_id,
-        metadata=metadata or {},
-    )
-    db.add(event)
-    db.commit()
-    return event
+    Raises ValueError for a type outside EVENT_TYPES: the column is an enum,
+    so the row could never be written.
+    """
+    if event_type not in EVENT_TYPES:
+        raise ValueError(f"Unknown event type: {event_type}")
+    row = {
+        "id": uuid.uuid4(),
+        "user_id": user_id,
+        "event_type": event_type,
+        "occurred_at": occurred_at or _utcnow(),
+        "target_id": target_id,
+        "metadata": metadata or {},
+    }
+    with _event_buffer_lock:
+        _event_buffer.append(row)
+        should_flush = len(_event_buffer) >= EVENT_FLUSH_SIZE
+    if should_flush:
+        if _event_flush_waker is not None:
+            _event_flush_waker()
+        else:
+            flush_events()
+    return row
+
+
+def _requeue_events(rows: List[Dict[str, Any]]) -> None:
+    """Put unwritten rows back at the front of the buffer, within the cap"""
+    with _event_buffer_lock:
+        _event_buffer[:0] = rows
+        overflow = len(_event_buffer) - EVENT_BUFFER_MAX
+        dropped = _event_buffer[:overflow] if overflow > 0 else []
+        del _event_buffer[: len(dropped)]
+    if dropped:
+        logger.error(
+            "Event buffer full; dropped %d oldest events (%s .. %s)",
+            len(dropped),
+            dropped[0]["occurred_at"],
+            dropped[-1]["occurred_at"],
+        )
+
+
+def flush_events() -> int:
+    """Write all buffered events; returns the number of rows written.
+
+    If the database rejects the batch (IntegrityError/DataError, e.g. a user
+    deleted meanwhile) the rows are retried one by one so one bad row doesn't
+    take the rest down; each row still rejected is logged. If the database is
+    unreachable (OperationalError) the unwritten rows go back in the buffer
+    for the next flush; any other failure requeues them and re-raises.
+    """
+    with _event_buffer_lock:
+        if not _event_buffer:
+            return 0
+        rows = _event_buffer[:]
+        _event_buffer.clear()
+
+    try:
+        with engine.begin() as conn:
+            conn.execute(insert(Event.__table__), rows)
+        return len(rows)
+    except (IntegrityError, DataError):
+        return _insert_events_one_by_one(rows)
+    except OperationalError as e:
+        logger.warning("Event flush failed, requeued %d events: %s", len(rows), e.orig)
+        _requeue_events(rows)
+        return 0
+    except Exception:
+        _requeue_events(rows)
+        raise
+    finally:
+        invalidate_user_stats({row["user_id"] for row in rows})
+
+
+def _insert_events_one_by_one(rows: List[Dict[str, Any]]) -> int:
+    written = 0
+    for i, row in enumerate(rows):
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(Event.__table__), [row])
+            written += 1
+        except (IntegrityError, DataError) as e:
+            logger.warning(
+                "Dropping event %s (%s for user %s): %s",
+                row["id"],
+                row["event_type"],
+                row["user_id"],
+                e.orig,
+            )
+        except OperationalError as e:
+            logger.warning(
+                "Event flush failed, requeued %d events: %s", len(rows) - i, e.orig
+            )
+            _requeue_events(rows[i:])
+            break
+        except Exception:
+            _requeue_events(rows[i:])
+            raise
+    return written
 
 
 def get_recent_events(db: Session, user_id: uuid.UUID, limit: int = 10):
@@ -643,23 +1314,96 @@ def get_recent_events(db: Session, user_id: uuid.UUID, limit: int = 10):
     )
 
 
+# Profile totals and streaks are read on every profile view but only change
+# when the user's events are written, so they are cached per user and dropped
+# by flush_events. The TTL bounds staleness across worker processes (and the
+# streak rollover at midnight).
+_stats_cache = TTLCache(maxsize=10_000, ttl=60)
+_stats_cache_lock = threading.Lock()
+
+
+def invalidate_user_stats(user_ids) -> None:
+    with _stats_cache_lock:
+        for user_id in user_ids:
+            _stats_cache.pop(("totals", user_id), None)
+            _stats_cache.pop(("streaks", user_id), None)
+
+
+def _cached_stat(key, compute):
+    with _stats_cache_lock:
+        value = _stats_cache.get(key)
+    if value is None:
+        value = compute()
+        with _stats_cache_lock:
+            _stats_cache[key] = value
+    return value
+
+
+# Profile totals: output key -> the event type it counts
+TOTALS_EVENT_TYPES = {
+    "notes_created": "NOTE_CREATED",
+    "notes_reviewed": "NOTE_REVIEWED",
+    "flashcards_created": "FLASHCARD_CREATED",
+    "flashcards_reviewed": "FLASHCARD_REVIEWED",
+}
+
+
 def get_totals(db: Session, user_id: uuid.UUID):
-    from sqlalchemy import func as _func
-    from .database import Event
+    """Lifetime counts per tracked event type, as one row of FILTER counts
+    over the user's rows of those types only"""
+    totals = _cached_stat(("totals", user_id), lambda: _query_totals(db, user_id))
+    return dict(totals)
 
-    totals = (
-        db.query(Event.event_type, _func.count())
-        .filter(Event.user_id == user_id)
-        .group_by(Event.event_type)
-        .all()
+
+def _query_totals(db: Session, user_id: uuid.UUID):
+    types = list(TOTALS_EVENT_TYPES.values())
+    row = (
+        db.query(*(func.count().filter(Event.event_type == t) for t in types))
+        .filter(Event.user_id == user_id, Event.event_type.in_(types))
+        .one()
     )
-    as_map = {k: v for k, v in totals}
-    return {
-        "notes_created": int(as_map.get("NOTE_CREATED", 0)),
-        "notes_reviewed": int(as_map.get("NOTE_REVIEWED", 0)),
-        "flashcards_created": int(as_map.get("FLASHCARD_CREATED", 0)),
-        "flashcards_reviewed": int(as_map.get("FLASHCARD_REVIEWED", 0)),
-    }
+    return {key: int(count) for key, count in zip(TOTALS_EVENT_TYPES, row)}
+
+
+# Known activity vocabulary, and the event types behind each activity kind
+ACTIVITY_EVENT_TYPES = list(EVENT_TYPES)
+ACTIVITY_KIND_TYPES = {
+    "all": ACTIVITY_EVENT_TYPES,
+    "notes": ["NOTE_CREATED", "NOTE_REVIEWED"],
+    "flashcards": ["FLASHCARD_CREATED", "FLASHCARD_REVIEWED"],
+}
+
+
+# Recounts activity_daily from events, e.g. after events were bulk-loaded
+# around the trigger. Mirrors the backfill in _DEV_SCHEMA_SQL.
+_REBUILD_ACTIVITY_DAILY_SQL = sql_text(
+    """
+    INSERT INTO activity_daily (user_id, day, kind, count)
+    SELECT e.user_id, DATE(e.occurred_at AT TIME ZONE 'UTC'), k.kind, COUNT(*)
+    FROM events e
+    CROSS JOIN LATERAL (
+      VALUES ('all'),
+             (CASE
+                WHEN e.event_type IN ('NOTE_CREATED', 'NOTE_REVIEWED') THEN 'notes'
+                WHEN e.event_type IN ('FLASHCARD_CREATED', 'FLASHCARD_REVIEWED') THEN 'flashcards'
+              END)
+    ) AS k(kind)
+    WHERE k.kind IS NOT NULL AND e.user_id = :uid
+    GROUP BY 1, 2, 3
+    ON CONFLICT (user_id, day, kind) DO UPDATE SET count = EXCLUDED.count
+    """
+)
+
+
+def rebuild_activity_daily(db: Session, user_id: uuid.UUID) -> None:
+    """Recompute a user's activity_daily rows from their events"""
+    flush_events()
+    db.query(ActivityDaily).filter(ActivityDaily.user_id == user_id).delete(
+        synchronize_session=False
+    )
+    db.execute(_REBUILD_ACTIVITY_DAILY_SQL, {"uid": str(user_id)})
+    db.commit()
+    invalidate_user_stats([user_id])
 
 
 def get_activity_counts(
@@ -668,90 +1412,113 @@ def get_activity_counts(
     from_date_utc: datetime,
     to_date_utc: datetime,
     kind: str = "all",
+    with_top_type: bool = False,
 ):
-    from sqlalchemy import func as _func
-    from .database import Event
-
-    q = db.query(
-        _func.date_trunc("day", Event.occurred_at).label("day"),
-        _func.count().label("count"),
-        _func.mode().within_group(Event.event_type).label("top_type"),
-    ).filter(
-        Event.user_id == user_id,
-        Event.occurred_at >= from_date_utc,
-        Event.occurred_at <= to_date_utc,  # Changed from < to <= to include end date
-    )
-
-    if kind == "notes":
-        q = q.filter(Event.event_type.in_(["NOTE_CREATED", "NOTE_REVIEWED"]))
-    elif kind == "flashcards":
-        q = q.filter(Event.event_type.in_(["FLASHCARD_CREATED", "FLASHCARD_REVIEWED"]))
-    # For "all" kind, don't filter by event type - include everything
+    """Per-day (day, count) rows for a kind, inclusive of both end dates.
 
-    rows = q.group_by("day").order_by("day").all()
-    return rows
+    Reads the trigger-maintained activity_daily table, so the cost scales
+    with the number of days in range rather than the number of events.
+    with_top_type appends each day's most frequent event type.
+    """
+    rows = (
+        db.query(ActivityDaily.day, ActivityDaily.count)
+        .filter(
+            ActivityDaily.user_id == user_id,
+            ActivityDaily.kind == kind,
+            ActivityDaily.day >= from_date_utc.date(),
+            ActivityDaily.day <= to_date_utc.date(),
+        )
+        .order_by(ActivityDaily.day)
+        .all()
+    )
+    if not with_top_type or not rows:
+        return rows
 
+    top_types = _get_top_types(db, user_id, from_date_utc, to_date_utc, kind)
+    return [(day, count, top_types.get(day)) for day, count in rows]
 
-def compute_streaks(db: Session, user_id: uuid.UUID):
-    from sqlalchemy import func as _func
-    from .database import Event
 
+def _get_top_types(
+    db: Session,
+    user_id: uuid.UUID,
+    from_date_utc: datetime,
+    to_date_utc: datetime,
+    kind: str,
+) -> Dict[Any, str]:
+    """Most frequent event type per UTC day, from one FILTER count per known
+    type (cheaper than the per-day sort behind mode() WITHIN GROUP)."""
+    types = ACTIVITY_KIND_TYPES.get(kind, ACTIVITY_EVENT_TYPES)
+    day = func.date(func.timezone("UTC", Event.occurred_at))
     rows = (
-        db.query(_func.date_trunc("day", Event.occurred_at).label("day"), _func.count())
+        db.query(
+            day, *(func.count().filter(Event.event_type == t) for t in types)
+        )
         .filter(
             Event.user_id == user_id,
-            # Include ALL activity types for streak calculation, not just reviews
-            Event.event_type.in_(
-                [
-                    "NOTE_CREATED",
-                    "NOTE_REVIEWED",
-                    "NOTE_UPDATED",
-                    "FLASHCARD_CREATED",
-                    "FLASHCARD_REVIEWED",
-                    "FLASHCARD_UPDATED",
-                    "FLASHCARD_TAGGED",
-                ]
-            ),
+            Event.event_type.in_(types),
+            Event.occurred_at >= from_date_utc,
+            Event.occurred_at <= to_date_utc,
         )
-        .group_by("day")
-        .order_by("day")
+        .group_by(day)
         .all()
     )
-    # Compute current and best streak in Python using UTC days
-    days = [r[0].date() for r in rows]
-    if not days:
-        return 0, 0
-    days_set = set(days)
-    from datetime import timedelta
-
-    today = datetime.now(timezone.utc).date()
-    # current streak
-    cur = 0
-    d = today
-    while d in days_set:
-        cur += 1
-        d -= timedelta(days=1)
-    # best streak
-    best = 0
-    start = min(days_set)
-    d = start
-    run = 0
-    while d <= today:
-        if d in days_set:
-            run += 1
-            best = max(best, run)
-        else:
-            run = 0
-        d += timedelta(days=1)
-    return cur, best
+    top_types = {}
+    for row in rows:
+        counts = row[1:]
+        best = max(range(len(types)), key=counts.__getitem__)
+        if counts[best]:
+            top_types[row[0]] = types[best]
+    return top_types
+
+
+# Every activity type counts towards a streak, not just reviews, which is
+# exactly the "all" kind of activity_daily
+STREAK_ACTIVITY_KIND = "all"
+
+# Gaps-and-islands over the user's activity days: consecutive days share
+# day - row_number(), so each group is one streak. The current streak is the
+# island ending today. activity_daily has one row per (user, day, kind), so
+# this reads an index range instead of every event the user ever produced.
+_STREAKS_SQL = sql_text(
+    """
+    WITH g AS (
+        SELECT day, day - (ROW_NUMBER() OVER (ORDER BY day))::int AS grp
+        FROM activity_daily
+        WHERE user_id = :uid AND kind = :kind AND count > 0 AND day <= :today
+    ),
+    r AS (
+        SELECT COUNT(*) AS len, MAX(day) AS last FROM g GROUP BY grp
+    )
+    SELECT COALESCE(MAX(len) FILTER (WHERE last = :today), 0) AS cur,
+           COALESCE(MAX(len), 0) AS best
+    FROM r
+    """
+)
+
+
+def compute_streaks(db: Session, user_id: uuid.UUID):
+    """Return (current_streak, best_streak) in UTC days, computed in SQL"""
+    return _cached_stat(("streaks", user_id), lambda: _query_streaks(db, user_id))
+
+
+def _query_streaks(db: Session, user_id: uuid.UUID):
+    today = _utcnow().date()
+    cur, best = db.execute(
+        _STREAKS_SQL,
+        {"uid": str(user_id), "kind": STREAK_ACTIVITY_KIND, "today": today},
+    ).one()
+    return int(cur), int(best)
 
 
 # Backlinks and tags helpers
-def set_note_tags(db: Session, note: Note, tags: list[str]) -> Note:
+def set_note_tags(
+    db: Session, note: Note, tags: list[str], commit: bool = True
+) -> Note:
     note.tags = tags
-    note.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(note)
+    if commit:
+        db.commit()
+    else:
+        db.flush()
     return note
 
 
@@ -760,32 +1527,35 @@ def create_note_link(
     from_note_id: uuid.UUID,
     to_note_id: uuid.UUID,
     link_type: str = "manual",
+    commit: bool = True,
 ) -> NoteLink:
     link = NoteLink(
         from_note_id=from_note_id, to_note_id=to_note_id, link_type=link_type
     )
     db.add(link)
-    db.commit()
-    db.refresh(link)
+    if commit:
+        db.commit()
+        db.refresh(link)
+    else:
+        db.flush()
     return link
 
 
 def delete_note_link(
-    db: Session, from_note_id: uuid.UUID, to_note_id: uuid.UUID
+    db: Session, from_note_id: uuid.UUID, to_note_id: uuid.UUID, commit: bool = True
 ) -> None:
     db.query(NoteLink).filter(
         NoteLink.from_note_id == from_note_id, NoteLink.to_note_id == to_note_id
-    ).delete()
-    db.commit()
+    ).delete(synchronize_session=False)
+    if commit:
+        db.commit()
 
 
 def get_backlinks(db: Session, note_id: uuid.UUID) -> list[Note]:
-    # Notes that link to this note
-    from_links = db.query(NoteLink).filter(NoteLink.to_note_id == note_id).all()
-    from_ids = [link_to_note.from_note_id for link_to_note in from_links]
-    if not from_ids:
-        return []
-    return db.query(Note).filter(Note.id.in_(from_ids)).all()
+    # Notes that link to this note, as one semi-join (a note linking twice
+    # still appears once)
+    linking_ids = select(NoteLink.from_note_id).where(NoteLink.to_note_id == note_id)
+    return db.query(Note).filter(Note.id.in_(linking_ids)).all()
 
 
 def replace_manual_links_for_note(
@@ -793,23 +1563,59 @@ def replace_manual_links_for_note(
     user_id: uuid.UUID,
     from_note_id: uuid.UUID,
     to_note_ids: list[uuid.UUID],
+    commit: bool = True,
 ) -> None:
     """Replace manual links for a note with provided targets."""
     # delete existing manual links from this note
-    db.query(NoteLink).filter(NoteLink.from_note_id == from_note_id).delete()
-    # insert new ones
-    for tid in to_note_ids:
-        if tid == from_note_id:
-            continue
-        link = NoteLink(from_note_id=from_note_id, to_note_id=tid, link_type="manual")
-        db.add(link)
-    db.commit()
+    db.query(NoteLink).filter(NoteLink.from_note_id == from_note_id).delete(
+        synchronize_session=False
+    )
+    # insert new ones as multi-row INSERTs in the same transaction
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "from_note_id": from_note_id,
+            "to_note_id": tid,
+            "link_type": "manual",
+        }
+        for tid in to_note_ids
+        if tid != from_note_id
+    ]
+    for start in range(0, len(rows), BULK_INSERT_BATCH_SIZE):
+        db.execute(insert(NoteLink), rows[start : start + BULK_INSERT_BATCH_SIZE])
+    if commit:
+        db.commit()
 
 
-def get_links_for_user_notes(db: Session, note_ids: list[uuid.UUID]) -> list[NoteLink]:
+def get_links_for_user_notes(db: Session, note_ids: list[uuid.UUID]):
+    """(from_note_id, to_note_id) rows for links out of the given notes"""
     if not note_ids:
         return []
-    return db.query(NoteLink).filter(NoteLink.from_note_id.in_(note_ids)).all()
+    stmt = select(NoteLink.from_note_id, NoteLink.to_note_id).where(
+        NoteLink.from_note_id == _any_of(note_ids, UUID(as_uuid=True))
+    )
+    return db.execute(stmt).all()
+
+
+def _note_similarity_row(
+    note_a_id: uuid.UUID, note_b_id: uuid.UUID, similarity_float: float
+) -> Dict[str, Any]:
+    """Similarity row scaled to 0..1000 with ids ordered to keep uniqueness."""
+    a, b = (
+        (note_a_id, note_b_id)
+        if str(note_a_id) < str(note_b_id)
+        else (note_b_id, note_a_id)
+    )
+    scaled = int(max(0.0, min(1.0, similarity_float)) * 1000)
+    return {"note_a_id": a, "note_b_id": b, "similarity": scaled}
+
+
+def _note_similarity_upsert(rows: List[Dict[str, Any]]):
+    stmt = pg_insert(NoteSimilarity).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=["note_a_id", "note_b_id"],
+        set_={"similarity": stmt.excluded.similarity, "updated_at": func.now()},
+    )
 
 
 def upsert_note_similarity(
@@ -819,41 +1625,86 @@ def upsert_note_similarity(
     similarity_float: float,
 ):
     """Store similarity scaled to 0..1000. Order ids to keep uniqueness."""
-    from .database import NoteSimilarity
+    stmt = _note_similarity_upsert(
+        [_note_similarity_row(note_a_id, note_b_id, similarity_float)]
+    ).returning(NoteSimilarity)
+    row = db.scalars(stmt, execution_options={"populate_existing": True}).one()
+    db.commit()
+    return row
 
-    a, b = (
-        (note_a_id, note_b_id)
-        if str(note_a_id) < str(note_b_id)
-        else (note_b_id, note_a_id)
-    )
-    scaled = int(max(0.0, min(1.0, similarity_float)) * 1000)
-    row = (
-        db.query(NoteSimilarity)
-        .filter(NoteSimilarity.note_a_id == a, NoteSimilarity.note_b_id == b)
-        .first()
-    )
-    if row:
-        row.similarity = scaled
+
+def upsert_note_similarities(
+    db: Session, pairs: List[Tuple[uuid.UUID, uuid.UUID, float]]
+) -> None:
+    """Batch variant of upsert_note_similarity: one INSERT ... ON CONFLICT per
+    BULK_INSERT_BATCH_SIZE pairs, committed once. Refreshes larger than one
+    batch are COPYed into a temp table and merged in a single statement."""
+    # ON CONFLICT can't touch the same row twice in one statement; last wins
+    by_pair = {}
+    for note_a_id, note_b_id, similarity_float in pairs:
+        row = _note_similarity_row(note_a_id, note_b_id, similarity_float)
+        by_pair[(row["note_a_id"], row["note_b_id"])] = row
+    rows = list(by_pair.values())
+    if len(rows) > BULK_INSERT_BATCH_SIZE:
+        _copy_note_similarities(db, rows)
     else:
-        row = NoteSimilarity(note_a_id=a, note_b_id=b, similarity=scaled)
-        db.add(row)
+        for start in range(0, len(rows), BULK_INSERT_BATCH_SIZE):
+            batch = rows[start : start + BULK_INSERT_BATCH_SIZE]
+            db.execute(_note_similarity_upsert(batch))
     db.commit()
-    return row
 
 
-def get_similarities_for_notes(db: Session, note_ids: list[uuid.UUID]):
-    from .database import NoteSimilarity
+_SIM_COPY_TABLE_SQL = """
+CREATE TEMP TABLE tmp_note_sim (
+  note_a_id UUID NOT NULL,
+  note_b_id UUID NOT NULL,
+  similarity SMALLINT NOT NULL
+) ON COMMIT DROP
+"""
+
+_SIM_COPY_MERGE_SQL = """
+INSERT INTO note_similarities (note_a_id, note_b_id, similarity, updated_at)
+SELECT note_a_id, note_b_id, similarity, NOW() FROM tmp_note_sim
+ON CONFLICT (note_a_id, note_b_id)
+DO UPDATE SET similarity = EXCLUDED.similarity, updated_at = EXCLUDED.updated_at
+"""
+
+
+def _copy_note_similarities(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """COPY deduplicated similarity rows into a transaction-scoped temp table
+    and upsert them from there. Similarities can always be recomputed, so the
+    transaction skips waiting for the WAL flush on commit."""
+    buf = io.StringIO(
+        "".join(
+            f"{r['note_a_id']}\t{r['note_b_id']}\t{r['similarity']}\n" for r in rows
+        )
+    )
+    conn = db.connection()
+    conn.exec_driver_sql("SET LOCAL synchronous_commit = OFF")
+    conn.exec_driver_sql(_SIM_COPY_TABLE_SQL)
+    with conn.connection.cursor() as cur:
+        cur.copy_expert("COPY tmp_note_sim FROM STDIN", buf)
+    conn.exec_driver_sql(_SIM_COPY_MERGE_SQL)
 
+
+def get_similarities_for_notes(db: Session, note_ids: list[uuid.UUID]):
     if not note_ids:
         return []
-    return (
-        db.query(NoteSimilarity)
-        .filter(
-            NoteSimilarity.note_a_id.in_(note_ids)
-            | NoteSimilarity.note_b_id.in_(note_ids)
-        )
-        .all()
+    # Two IN scans (PK prefix / note_b index) instead of an OR across both;
+    # UNION drops pairs where both ends are in note_ids. Only the pair and
+    # score are read, as plain rows rather than ORM entities.
+    cols = (
+        NoteSimilarity.note_a_id,
+        NoteSimilarity.note_b_id,
+        NoteSimilarity.similarity,
     )
+    by_a = select(*cols).where(
+        NoteSimilarity.note_a_id == _any_of(note_ids, UUID(as_uuid=True))
+    )
+    by_b = select(*cols).where(
+        NoteSimilarity.note_b_id == _any_of(note_ids, UUID(as_uuid=True))
+    )
+    return db.execute(by_a.union(by_b)).all()
 
 
 # Enhanced flashcard functions
@@ -870,13 +1721,14 @@ def get_user_flashcards(
     if tags:
         query = query.filter(Flashcard.tags.overlap(tags))
 
-    # Filter by search query if provided
+    # Filter by search query if provided; plain ILIKE on the columns lets the
+    # trigram indexes serve the substring match
     if search:
-        search_term = f"%{search.lower()}%"
+        search_term = f"%{search}%"
         query = query.filter(
             or_(
-                func.lower(Flashcard.question).like(search_term),
-                func.lower(Flashcard.answer).like(search_term),
+                Flashcard.question.ilike(search_term),
+                Flashcard.answer.ilike(search_term),
             )
         )
 
@@ -894,17 +1746,45 @@ def get_flashcards_by_tag(db: Session, user_id: uuid.UUID, tag: str) -> List[Fla
     )
 
 
+# Answers kept in Flashcard.user_answer_history
+ANSWER_HISTORY_LIMIT = 10
+
+# Append one entry to the history and keep the last ANSWER_HISTORY_LIMIT, as
+# a SET expression so the history never round-trips through Python
+_APPEND_ANSWER_HISTORY_SQL = sql_text(
+    """
+(
+  SELECT COALESCE(jsonb_agg(e.value ORDER BY e.n), '[]'::jsonb)
+  FROM jsonb_array_elements(
+    COALESCE(user_answer_history, '[]'::jsonb) || CAST(:answer_entry AS jsonb)
+  ) WITH ORDINALITY AS e(value, n)
+  WHERE e.n > jsonb_array_length(COALESCE(user_answer_history, '[]'::jsonb))
+    + 1 - :answer_limit
+)
+"""
+)
+
+
 def update_flashcard_progress(
-    db: Session, flashcard_id: uuid.UUID, performance_score: int, user_answer: str
+    db: Session,
+    flashcard_id: uuid.UUID,
+    performance_score: int,
+    user_answer: str,
+    now: Optional[datetime] = None,
 ) -> Flashcard:
-    """Update flashcard progress after review"""
-    flashcard = db.query(Flashcard).filter(Flashcard.id == flashcard_id).first()
+    """Update flashcard progress after review. `now` lets a caller stamp
+    several updates in one request with the same time."""
+    flashcard = db.get(
+        Flashcard, flashcard_id, options=[defer(Flashcard.user_answer_history)]
+    )
     if not flashcard:
         raise ValueError("Flashcard not found")
 
+    now = now or _utcnow()
+
     # Update progress
     flashcard.review_count += 1
-    flashcard.last_reviewed = datetime.now(timezone.utc)
+    flashcard.last_reviewed = now
     flashcard.last_performance = performance_score
 
     # Calculate new mastery level (simple algorithm - can be improved)
@@ -925,81 +1805,106 @@ def update_flashcard_progress(
     if performance_score >= 80:
         # Good performance - review later
         days_until_review = min(30, flashcard.review_count * 2)
-        flashcard.next_review = datetime.now(timezone.utc) + timedelta(
-            days=days_until_review
-        )
+        flashcard.next_review = now + timedelta(days=days_until_review)
     else:
         # Poor performance - review soon
-        flashcard.next_review = datetime.now(timezone.utc) + timedelta(days=1)
+        flashcard.next_review = now + timedelta(days=1)
 
-    # Store user answer history
-    if not flashcard.user_answer_history:
-        flashcard.user_answer_history = {}
-
-    flashcard.user_answer_history[str(datetime.now(timezone.utc))] = {
+    # Store user answer history, keeping only the last 10 answers; appended
+    # and trimmed by Postgres in the same UPDATE
+    entry = {
+        "ts": now.isoformat(),
         "answer": user_answer,
         "score": performance_score,
         "mastery": flashcard.mastery_level,
     }
-
-    # Keep only last 10 answers
-    if len(flashcard.user_answer_history) > 10:
-        # Remove oldest entries
-        sorted_keys = sorted(flashcard.user_answer_history.keys())
-        for key in sorted_keys[:-10]:
-            del flashcard.user_answer_history[key]
+    flashcard.user_answer_history = _APPEND_ANSWER_HISTORY_SQL.bindparams(
+        bindparam("answer_entry", entry, type_=JSONB),
+        bindparam("answer_limit", ANSWER_HISTORY_LIMIT),
+    )
 
     db.commit()
-    db.refresh(flashcard)
     return flashcard
 
 
-def add_flashcard_tag(db: Session, flashcard_id: uuid.UUID, tag: str) -> Flashcard:
+def add_flashcard_tag(
+    db: Session, flashcard_id: uuid.UUID, tag: str, commit: bool = True
+) -> Flashcard:
     """Add a tag to a flashcard"""
-    flashcard = db.query(Flashcard).filter(Flashcard.id == flashcard_id).first()
-    if not flashcard:
-        raise ValueError("Flashcard not found")
-
-    if not flashcard.tags:
-        flashcard.tags = []
+    tag_value = literal(tag, String)
+    return _update_flashcard_tags(
+        db,
+        flashcard_id,
+        func.array_append(Flashcard.tags, tag_value),
+        ~Flashcard.tags.any(tag_value),
+        commit,
+    )
 
-    if tag not in flashcard.tags:
-        flashcard.tags.append(tag)
-        db.commit()
-        db.refresh(flashcard)
 
-    return flashcard
+def remove_flashcard_tag(
+    db: Session, flashcard_id: uuid.UUID, tag: str, commit: bool = True
+) -> Flashcard:
+    """Remove a tag from a flashcard"""
+    tag_value = literal(tag, String)
+    return _update_flashcard_tags(
+        db,
+        flashcard_id,
+        func.array_remove(Flashcard.tags, tag_value),
+        Flashcard.tags.any(tag_value),
+        commit,
+    )
 
 
-def remove_flashcard_tag(db: Session, flashcard_id: uuid.UUID, tag: str) -> Flashcard:
-    """Remove a tag from a flashcard"""
-    flashcard = db.query(Flashcard).filter(Flashcard.id == flashcard_id).first()
+def _update_flashcard_tags(
+    db: Session, flashcard_id: uuid.UUID, tags, changes, commit: bool
+) -> Flashcard:
+    """Set tags with one UPDATE ... RETURNING when `changes` holds; a card the
+    update leaves alone is read as is. commit=False leaves the transaction
+    open for the caller."""
+    stmt = (
+        update(Flashcard)
+        .where(Flashcard.id == flashcard_id, changes)
+        .values(tags=tags)
+        .returning(Flashcard)
+    )
+    opts = {"populate_existing": True}
+    flashcard = db.scalars(stmt, execution_options=opts).one_or_none()
+    if flashcard is not None:
+        if commit:
+            db.commit()
+        return flashcard
+
+    flashcard = db.get(Flashcard, flashcard_id)
     if not flashcard:
         raise ValueError("Flashcard not found")
-
-    if flashcard.tags and tag in flashcard.tags:
-        flashcard.tags.remove(tag)
-        db.commit()
-        db.refresh(flashcard)
-
     return flashcard
 
 
 def get_due_flashcards(
-    db: Session, user_id: uuid.UUID, limit: int = 20
+    db: Session, user_id: uuid.UUID, limit: int = 20, with_note: bool = False
 ) -> List[Flashcard]:
-    """Get flashcards that are due for review"""
-    now = datetime.now(timezone.utc)
-    return (
-        db.query(Flashcard)
-        .filter(
+    """Get flashcards that are due for review (with_note eager-loads
+    Flashcard.note in one extra IN query)"""
+    now = _utcnow()
+    stmt = lambda_stmt(
+        lambda: select(Flashcard)
+        .where(
             Flashcard.user_id == user_id,
             (Flashcard.next_review.is_(None) | (Flashcard.next_review <= now)),
         )
         .order_by(Flashcard.next_review.asc().nullslast())
         .limit(limit)
-        .all()
     )
+    stmt = _with_flashcard_note(stmt, with_note)
+    return db.execute(stmt).scalars().all()
+
+
+def _with_flashcard_note(stmt, with_note: bool):
+    """Opt-in eager load of each flashcard's note on a Flashcard lambda
+    statement, for callers that read it"""
+    if with_note:
+        stmt += lambda s: s.options(selectinload(Flashcard.note))
+    return stmt
 
 
 def create_contextual_flashcard(
@@ -1009,8 +1914,10 @@ def create_contextual_flashcard(
     note_id: uuid.UUID,
     user_id: uuid.UUID,
     context_notes: List[uuid.UUID],
+    commit: bool = True,
 ) -> Flashcard:
-    """Create a contextual flashcard with multiple note context"""
+    """Create a contextual flashcard with multiple note context (commit=False
+    flushes only)"""
     flashcard = Flashcard(
         question=question,
         answer=answer,
@@ -1021,112 +1928,207 @@ def create_contextual_flashcard(
         tags=["contextual"],
     )
     db.add(flashcard)
-    db.commit()
-    db.refresh(flashcard)
+    if commit:
+        db.commit()
+    else:
+        db.flush()
     return flashcard
 
 
 # SRS Engine Functions (SM-2-lite algorithm)
+
+# The SRS due queue is polled on every dashboard refresh but only changes when
+# one of the user's SRS entries is written, so its flashcard ids are cached
+# per user (by limit) and dropped on those writes - immediately and again
+# when the writing transaction commits, since a poll in between would cache
+# the old queue. Only queues read from the primary are cached, so replica lag
+# can't refill it with a just-reviewed card. The short TTL bounds staleness
+# across worker processes and at the midnight rollover.
+DUE_CACHE_TTL_SECONDS = 10
+_due_cache = TTLCache(maxsize=10_000, ttl=DUE_CACHE_TTL_SECONDS)
+_due_cache_lock = threading.Lock()
+
+
+def invalidate_due_cache(user_id: uuid.UUID) -> None:
+    with _due_cache_lock:
+        _due_cache.pop(user_id, None)
+
+
+def _mark_due_stale(db: Session, user_id: uuid.UUID) -> None:
+    invalidate_due_cache(user_id)
+    db.info.setdefault("stale_due_user_ids", set()).add(user_id)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidate_committed_due_queues(session):
+    for user_id in session.info.pop("stale_due_user_ids", ()):
+        invalidate_due_cache(user_id)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_stale_due_queues(session):
+    session.info.pop("stale_due_user_ids", None)
+
+
 def get_or_create_srs_entry(
-    db: Session, flashcard_id: uuid.UUID, user_id: uuid.UUID
+    db: Session,
+    flashcard_id: uuid.UUID,
+    user_id: uuid.UUID,
+    now: Optional[datetime] = None,
+    commit: bool = True,
 ) -> FlashcardSRS:
-    """Get or create SRS entry for a flashcard"""
-    srs_entry = (
-        db.query(FlashcardSRS).filter(FlashcardSRS.flashcard_id == flashcard_id).first()
+    """Get or create SRS entry for a flashcard in one INSERT ... ON CONFLICT
+    ... RETURNING. flashcard_id is the primary key; the no-op update on
+    conflict makes RETURNING yield the existing row. commit=False leaves the
+    transaction open for the caller."""
+    stmt = pg_insert(FlashcardSRS).values(
+        flashcard_id=flashcard_id,
+        user_id=user_id,
+        efactor=250,  # 2.5 * 100
+        interval_days=1,
+        due_date=(now or _utcnow()).date(),
+        repetitions=0,
     )
-
-    if not srs_entry:
-        # Create new SRS entry with defaults
-        srs_entry = FlashcardSRS(
-            flashcard_id=flashcard_id,
-            user_id=user_id,
-            efactor=250,  # 2.5 * 100
-            interval_days=1,
-            due_date=datetime.now(timezone.utc).date(),
-            repetitions=0,
-        )
-        db.add(srs_entry)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[FlashcardSRS.flashcard_id],
+        set_={"flashcard_id": stmt.excluded.flashcard_id},
+    ).returning(FlashcardSRS)
+    srs_entry = db.scalars(stmt, execution_options={"populate_existing": True}).one()
+    _mark_due_stale(db, user_id)
+    if commit:
         db.commit()
-        db.refresh(srs_entry)
-
     return srs_entry
 
 
+# SM-2-lite ladder: the first passed reviews are 1 and then 6 days apart,
+# later ones scale the last interval by the E-Factor
+_SRS_BASE_INTERVALS = (1, 6)
+# E-Factor * 100 change per quality 0-5:
+# 100 * (0.1 - (5 - q) * (0.08 + (5 - q) * 0.02)), floor 130
+_SRS_EF_DELTA = tuple(10 - (5 - q) * (8 + (5 - q) * 2) for q in range(6))
+_SRS_MIN_EFACTOR = 130
+
+
+def _srs_review_values(quality: int, today) -> Dict[str, Any]:
+    """SM-2-lite step for one review as SQL expressions over the current row,
+    so the whole update is a single statement. Right-hand sides see the
+    pre-update values, as the Python version did.
+
+    The E-Factor interval is computed in double precision exactly as Python
+    did (interval * (efactor / 100.0)); round() on double precision ties to
+    even like Python's round, where round() on numeric would round 10.5 up.
+    """
+    if quality < 3:
+        # Failed - reset to beginning
+        return {
+            "repetitions": 0,
+            "interval_days": 1,
+            "due_date": literal(today, Date) + 1,
+        }
+
+    # Passed - increase interval along the ladder, then by the E-Factor
+    interval = case(
+        *(
+            (FlashcardSRS.repetitions == reps, days)
+            for reps, days in enumerate(_SRS_BASE_INTERVALS)
+        ),
+        else_=cast(
+            func.greatest(
+                1,
+                func.round(
+                    FlashcardSRS.interval_days
+                    * (cast(FlashcardSRS.efactor, Float) / 100.0)
+                ),
+            ),
+            Integer,
+        ),
+    )
+    return {
+        "repetitions": FlashcardSRS.repetitions + 1,
+        "interval_days": interval,
+        "efactor": func.greatest(
+            _SRS_MIN_EFACTOR, FlashcardSRS.efactor + _SRS_EF_DELTA[quality]
+        ),
+        "due_date": literal(today, Date) + interval,
+    }
+
+
+def _srs_first_review_values(quality: int, today) -> Dict[str, Any]:
+    """The same step applied to a fresh entry (no repetitions, E-Factor 2.5)"""
+    passed = quality >= 3
+    efactor = max(_SRS_MIN_EFACTOR, 250 + _SRS_EF_DELTA[quality]) if passed else 250
+    return {
+        "repetitions": 1 if passed else 0,
+        "interval_days": _SRS_BASE_INTERVALS[0],
+        "efactor": efactor,
+        "due_date": today + timedelta(days=_SRS_BASE_INTERVALS[0]),
+    }
+
+
 def update_srs_after_review(
     db: Session,
     flashcard_id: uuid.UUID,
     user_id: uuid.UUID,
     quality: int,  # 0-5 quality rating
+    now: Optional[datetime] = None,
+    commit: bool = True,
 ) -> FlashcardSRS:
-    """Update SRS data after a review using SM-2-lite algorithm"""
-    srs_entry = get_or_create_srs_entry(db, flashcard_id, user_id)
-
-    # SM-2-lite algorithm
-    if quality < 3:
-        # Failed - reset to beginning
-        srs_entry.repetitions = 0
-        srs_entry.interval_days = 1
-    else:
-        # Passed - increase interval
-        srs_entry.repetitions += 1
-
-        if srs_entry.repetitions == 1:
-            srs_entry.interval_days = 1
-        elif srs_entry.repetitions == 2:
-            srs_entry.interval_days = 6
-        else:
-            # Calculate new interval using E-Factor
-            ef = srs_entry.efactor / 100.0  # Convert back to float
-            new_interval = round(srs_entry.interval_days * ef)
-            srs_entry.interval_days = max(1, new_interval)
-
-        # Update E-Factor based on quality
-        ef = srs_entry.efactor / 100.0
-        ef_change = 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
-        new_ef = max(1.3, ef + ef_change)
-        srs_entry.efactor = round(new_ef * 100)  # Store as integer
-
-    # Calculate next due date
-    next_due = datetime.now(timezone.utc).date() + timedelta(
-        days=srs_entry.interval_days
+    """Update SRS data after a review using SM-2-lite algorithm, as one
+    INSERT ... ON CONFLICT DO UPDATE ... RETURNING: a card without an entry
+    gets the first-review values, an existing entry is stepped in place.
+    commit=False leaves the transaction open for the caller."""
+    today = (now or _utcnow()).date()
+    # Ratings can come straight from the LLM grader; keep them on the 0-5 table
+    quality = min(5, max(0, int(quality)))
+    stmt = pg_insert(FlashcardSRS).values(
+        flashcard_id=flashcard_id,
+        user_id=user_id,
+        **_srs_first_review_values(quality, today),
     )
-    srs_entry.due_date = next_due
-    srs_entry.updated_at = datetime.now(timezone.utc)
-
-    db.commit()
-    db.refresh(srs_entry)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[FlashcardSRS.flashcard_id],
+        set_={**_srs_review_values(quality, today), "updated_at": func.now()},
+    ).returning(FlashcardSRS)
+    srs_entry = db.scalars(stmt, execution_options={"populate_existing": True}).one()
+    _mark_due_stale(db, user_id)
+    if commit:
+        db.commit()
     return srs_entry
 
 
 def get_due_flashcards_srs(
-    db: Session, user_id: uuid.UUID, limit: int = 20
+    db: Session, user_id: uuid.UUID, limit: int = 20, with_note: bool = False
 ) -> List[Flashcard]:
-    """Get flashcards that are due for review using SRS data"""
-    today = datetime.now(timezone.utc).date()
+    """Get flashcards that are due for review using SRS data, overdue first.
 
-    # Get flashcards due today or overdue
-    due_srs = (
-        db.query(FlashcardSRS)
-        .filter(FlashcardSRS.user_id == user_id, FlashcardSRS.due_date <= today)
+    A cached queue (see _due_cache) is re-read by primary key instead of
+    re-running the join; cards deleted since are skipped.
+    """
+    with _due_cache_lock:
+        ids = _due_cache.get(user_id, {}).get(limit)
+    if ids is not None:
+        if not ids:
+            return []
+        # Bound outside the lambda so the ids travel as one array parameter
+        due_ids = _any_of(ids, UUID(as_uuid=True))
+        stmt = lambda_stmt(lambda: select(Flashcard).where(Flashcard.id == due_ids))
+        stmt = _with_flashcard_note(stmt, with_note)
+        by_id = {f.id: f for f in db.execute(stmt).scalars()}
+        return [by_id[i] for i in ids if i in by_id]
+
+    today = _utcnow().date()
+    stmt = lambda_stmt(
+        lambda: select(Flashcard)
+        .join(FlashcardSRS, FlashcardSRS.flashcard_id == Flashcard.id)
+        .where(FlashcardSRS.user_id == user_id, FlashcardSRS.due_date <= today)
         .order_by(FlashcardSRS.due_date.asc())
         .limit(limit)
-        .all()
-    )
-
-    # Get flashcard IDs
-    flashcard_ids = [srs.flashcard_id for srs in due_srs]
-
-    if not flashcard_ids:
-        return []
-
-    # Get actual flashcard objects
-    flashcards = db.query(Flashcard).filter(Flashcard.id.in_(flashcard_ids)).all()
-
-    # Sort by due date (overdue first)
-    flashcards.sort(
-        key=lambda f: next(srs.due_date for srs in due_srs if srs.flashcard_id == f.id)
     )
-
+    stmt = _with_flashcard_note(stmt, with_note)
+    flashcards = db.execute(stmt).scalars().all()
+    if db.get_bind() is engine:
+        with _due_cache_lock:
+            _due_cache.setdefault(user_id, {})[limit] = [f.id for f in flashcards]
     return flashcards
 
 
@@ -1163,29 +2165,32 @@ def get_flashcard_sets_by_user(db: Session, user_id: uuid.UUID) -> List[Flashcar
 def archive_mastered_flashcards(
     db: Session, user_id: uuid.UUID, min_repetitions: int = 3
 ) -> List[Flashcard]:
-    """Find flashcards that have been mastered and suggest archiving"""
-    mastered_srs = (
-        db.query(FlashcardSRS)
-        .filter(
-            FlashcardSRS.user_id == user_id,
-            FlashcardSRS.repetitions >= min_repetitions,
-            FlashcardSRS.efactor >= 300,  # E-Factor >= 3.0 indicates mastery
-        )
-        .all()
+    """Find flashcards that have been mastered and suggest archiving.
+
+    Tags every mastered card "recently_learned" with one set-based UPDATE, then
+    reads the cards back with a single join on the SRS rows."""
+    mastered = (
+        FlashcardSRS.user_id == user_id,
+        FlashcardSRS.repetitions >= min_repetitions,
+        FlashcardSRS.efactor >= 300,  # E-Factor >= 3.0 indicates mastery
     )
+    tag = literal("recently_learned", String)
 
-    if not mastered_srs:
-        return []
-
-    flashcard_ids = [srs.flashcard_id for srs in mastered_srs]
-    flashcards = db.query(Flashcard).filter(Flashcard.id.in_(flashcard_ids)).all()
-
-    # Add recently_learned tag to mastered flashcards
-    for flashcard in flashcards:
-        if not flashcard.tags:
-            flashcard.tags = []
-        if "recently_learned" not in flashcard.tags:
-            flashcard.tags.append("recently_learned")
+    db.execute(
+        update(Flashcard)
+        .where(
+            Flashcard.id.in_(select(FlashcardSRS.flashcard_id).where(*mastered)),
+            ~Flashcard.tags.any(tag),
+        )
+        .values(tags=func.array_append(Flashcard.tags, tag))
+        .execution_options(synchronize_session=False)
+    )
+    flashcards = db.scalars(
+        select(Flashcard)
+        .join(FlashcardSRS, FlashcardSRS.flashcard_id == Flashcard.id)
+        .where(*mastered),
+        execution_options={"populate_existing": True},
+    ).all()
 
     db.commit()
     return flashcards
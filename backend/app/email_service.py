@@ -7,6 +7,7 @@ from sendgrid.helpers.mail import Mail, Email, To, Content, HtmlContent
 from pydantic import EmailStr
 import jwt
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
 from .config import settings
 from .database import get_db, Session
@@ -14,8 +15,9 @@ from .auth import get_user_by_email, get_user_by_id
 import uuid
 
 
+@lru_cache(maxsize=1)
 def get_sendgrid_client():
-    """Get SendGrid client with current configuration"""
+    """Get SendGrid client with current configuration (built once per process)"""
     return SendGridAPIClient(api_key=settings.sendgrid_api_key)
 
 
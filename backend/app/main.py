@@ -2,6 +2,8 @@
 StudentsAI MVP - FastAPI Backend Application
 """
 
+import asyncio
+import logging
 import uuid
 from typing import List, Optional
 from fastapi import (
@@ -34,14 +36,18 @@ from .config import (
 from .oauth_service import GoogleOAuthService
 from .database import (
     get_db,
+    get_read_db,
     create_tables,
     get_notes_by_user,
+    iter_notes_by_user,
+    get_note_rows_by_user,
     get_note_by_id,
     create_note,
     update_note,
     delete_note,
     get_flashcards_by_note,
-    create_flashcard,
+    create_flashcards_bulk,
+    create_contextual_flashcards_bulk,
     set_note_tags,
     create_note_link,
     delete_note_link,
@@ -51,11 +57,14 @@ from .database import (
     get_links_for_user_notes,
     get_similarities_for_notes,
     record_event,
+    flush_events,
+    set_event_flush_waker,
+    EVENT_FLUSH_INTERVAL_SECONDS,
     get_recent_events,
     get_totals,
     get_activity_counts,
+    rebuild_activity_daily,
     compute_streaks,
-    ActivityDaily,
     get_user_by_id,
     get_user_by_username,
     get_user_by_email,
@@ -67,7 +76,6 @@ from .database import (
     add_flashcard_tag,
     remove_flashcard_tag,
     get_due_flashcards,
-    create_contextual_flashcard,
     # SRS and flashcard set functions
     get_or_create_srs_entry,
     update_srs_after_review,
@@ -152,8 +160,10 @@ from .ai_service import (
     summarize_content,
     generate_flashcards_from_content,
     calculate_note_similarities,
+    find_related_notes,
     extract_keywords_from_text,
     ai_service,
+    close_shared_client,
 )
 from .email_service import (
     create_verification_token,
@@ -264,15 +274,12 @@ async def health_check():
 async def test_email_service(
     request: Request,
     user_id: uuid.UUID = Depends(get_current_user_id),
+    user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Test endpoint to verify email service is working"""
     await check_rate_limit(request, str(user_id))
 
-    user = get_user_by_id(db, user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     try:
         # Test basic email sending
         from .email_service import send_email_via_sendgrid
@@ -330,6 +337,59 @@ async def startup_event():
         asyncio.create_task(enhanced_rate_limiter.init_redis())
     except Exception:
         pass
+    global _event_flush_task, _event_flush_wakeup
+    _event_flush_wakeup = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    # record_event can run on the loop or in a worker thread; either way a
+    # full buffer just wakes the flush task instead of writing inline
+    set_event_flush_waker(lambda: loop.call_soon_threadsafe(_event_flush_wakeup.set))
+    _event_flush_task = asyncio.create_task(_flush_events_periodically())
+
+
+_event_flush_task = None
+_event_flush_wakeup = None
+
+
+async def _flush_events_periodically():
+    """Write buffered activity events to the database on a fixed interval,
+    or sooner when record_event reports a full buffer"""
+    while True:
+        try:
+            await asyncio.wait_for(
+                _event_flush_wakeup.wait(), timeout=EVENT_FLUSH_INTERVAL_SECONDS
+            )
+        except asyncio.TimeoutError:
+            pass
+        _event_flush_wakeup.clear()
+        try:
+            await asyncio.to_thread(flush_events)
+        except Exception as e:
+            logging.warning(f"Event flush failed: {e}")
+
+
+# Release pooled connections on shutdown
+@app.on_event("shutdown")
+async def shutdown_event():
+    if _event_flush_task:
+        _event_flush_task.cancel()
+    set_event_flush_waker(None)
+    try:
+        await asyncio.to_thread(flush_events)
+    except Exception as e:
+        logging.warning(f"Event flush on shutdown failed: {e}")
+    try:
+        await enhanced_rate_limiter.close_redis()
+    except Exception:
+        pass
+    # Close each client on its own so one failure doesn't leak the other
+    try:
+        await ai_service.close()
+    except Exception:
+        pass
+    try:
+        await close_shared_client()
+    except Exception:
+        pass
 
 
 # Global exception handler
@@ -356,7 +416,7 @@ async def register(
     await check_auth_rate_limit(request)
 
     try:
-        user = register_user(db, user_data)
+        user = await register_user(db, user_data)
 
         # Send verification email asynchronously (don't block registration)
         import asyncio
@@ -407,7 +467,7 @@ async def login(user_data: UserLogin, request: Request, db: Session = Depends(ge
     """Login user"""
     await check_auth_rate_limit(request)
 
-    user = authenticate_user(db, user_data.email, user_data.password)
+    user = await authenticate_user(db, user_data.email, user_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -575,17 +635,11 @@ async def send_verification_email_endpoint(
 async def send_email_change_verification(
     request: EmailChangeRequest,
     current_user_id: uuid.UUID = Depends(get_current_user_id),
+    current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Step 1: Initiate email change verification process"""
     try:
-        # Get current user
-        current_user = get_user_by_id(db, current_user_id)
-        if not current_user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-            )
-
         # Check if new email is already in use by another user
         existing_user = get_user_by_email(db, request.new_email)
         if existing_user and existing_user.id != current_user.id:
@@ -886,7 +940,7 @@ async def get_notes(
     skip: int = 0,
     limit: int = 100,
     user_id: uuid.UUID = Depends(get_current_user_id),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Get user's notes"""
     try:
@@ -989,12 +1043,14 @@ async def update_existing_note(
             status_code=status.HTTP_404_NOT_FOUND, detail="Note not found"
         )
 
+    # The note update and its link rewrite share one transaction and commit
     updated_note = update_note(
         db,
         note,
         title=note_data.title,
         content=note_data.content,
         summary=note_data.summary,
+        commit=False,
     )
 
     # Record the note update event
@@ -1003,17 +1059,20 @@ async def update_existing_note(
     except Exception:
         pass  # Don't fail the request if event recording fails
 
-    # Parse manual wiki-links [[Title]] and update note_links
+    # Parse manual wiki-links [[Title]] and update note_links; a savepoint
+    # keeps a failure here from undoing the note update
     try:
-        content_to_parse = updated_note.content or ""
-        titles = re.findall(r"\[\[([^\]]+)\]\]", content_to_parse)
-        titles = [t.strip() for t in titles if t.strip()]
-        targets = get_notes_by_titles(db, user_id, titles)
-        replace_manual_links_for_note(
-            db, user_id, updated_note.id, [n.id for n in targets]
-        )
+        with db.begin_nested():
+            content_to_parse = updated_note.content or ""
+            titles = re.findall(r"\[\[([^\]]+)\]\]", content_to_parse)
+            titles = [t.strip() for t in titles if t.strip()]
+            targets = get_notes_by_titles(db, user_id, titles)
+            replace_manual_links_for_note(
+                db, user_id, updated_note.id, [n.id for n in targets], commit=False
+            )
     except Exception:
         pass
+    db.commit()
 
     return NoteResponse(
         id=updated_note.id,
@@ -1245,7 +1304,7 @@ async def extract_note_keywords(
 
     try:
         # Extract keywords using TF-IDF
-        keywords = extract_keywords_from_text(note.content)
+        keywords = await extract_keywords_from_text(note.content)
 
         # Update note with keywords
         updated_note = set_note_tags(db, note, keywords)
@@ -1337,11 +1396,15 @@ async def generate_note_flashcards(
             note.content, count
         )
 
+        flashcards = create_flashcards_bulk(
+            db,
+            [(f.question, f.answer) for f in generated_flashcards],
+            note_id,
+            user_id,
+        )
+
         saved_flashcards = []
-        for flashcard_data in generated_flashcards:
-            flashcard = create_flashcard(
-                db, flashcard_data.question, flashcard_data.answer, note_id, user_id
-            )
+        for flashcard in flashcards:
             try:
                 record_event(db, user_id, "FLASHCARD_CREATED", target_id=flashcard.id)
             except Exception:
@@ -1379,7 +1442,7 @@ async def get_user_flashcards_endpoint(
     search: Optional[str] = None,
     request: Request = None,
     user_id: uuid.UUID = Depends(get_current_user_id),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Get all flashcards for a user, optionally filtered by tags and search query"""
     await check_rate_limit(request, str(user_id))
@@ -1437,6 +1500,46 @@ async def get_due_flashcards_endpoint(
     ]
 
 
+# Compiled once; the answer scorer runs on every typed review
+_ANSWER_SYMBOLS_RE = re.compile(r"[^\w\s]")
+_ANSWER_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _score_typed_answer(typed_answer: str, correct_answer: str):
+    """Word-overlap scoring for typed answers (case-insensitive, symbol-ignoring).
+
+    Returns (quality_rating, ai_score, verdict, feedback).
+    """
+    # Remove ALL punctuation, symbols, and extra whitespace for comparison
+    typed_clean = _ANSWER_WHITESPACE_RE.sub(
+        " ", _ANSWER_SYMBOLS_RE.sub("", typed_answer.lower()).strip()
+    )
+    correct_clean = _ANSWER_WHITESPACE_RE.sub(
+        " ", _ANSWER_SYMBOLS_RE.sub("", correct_answer.lower()).strip()
+    )
+
+    if typed_clean == correct_clean:
+        return 5, 100, "correct", "Perfect answer!"
+
+    correct_words = set(correct_clean.split())
+    if not correct_words:
+        return 1, 20, "incorrect", "Answer needs improvement"
+
+    overlap = len(correct_words.intersection(typed_clean.split()))
+    similarity_score = (overlap / len(correct_words)) * 100
+
+    # Much more generous scoring for real-world answers
+    if similarity_score >= 0.8:  # Lowered from 0.9
+        return 5, 95, "correct", "Excellent answer!"
+    if similarity_score >= 0.6:  # Lowered from 0.75
+        return 4, 80, "correct", "Very good answer!"
+    if similarity_score >= 0.4:  # Lowered from 0.6
+        return 3, 65, "partial", "Good effort, but missing some key points"
+    if similarity_score >= 0.2:  # Lowered from 0.4
+        return 2, 45, "partial", "Some understanding shown, but needs improvement"
+    return 1, 25, "incorrect", "Answer needs significant improvement"
+
+
 @app.post("/flashcards/{flashcard_id}/review", response_model=FlashcardReviewResponse)
 async def review_flashcard(
     flashcard_id: uuid.UUID,
@@ -1449,12 +1552,19 @@ async def review_flashcard(
     await check_rate_limit(request, str(user_id))
 
     try:
-        # Update flashcard progress
-        flashcard = update_flashcard_progress(
+        # One timestamp for the whole review
+        now = datetime.now(timezone.utc)
+
+        # Update flashcard progress. The review endpoints are async (they
+        # await the LLM grader), so their blocking DB calls run in a worker
+        # thread rather than stalling the event loop.
+        flashcard = await asyncio.to_thread(
+            update_flashcard_progress,
             db,
             flashcard_id,
             review_data.performance_score or 0,
             review_data.user_answer,
+            now=now,
         )
 
         # Record review event
@@ -1541,137 +1651,33 @@ async def review_flashcard(
                         print(f"LLM evaluation failed: {e}")
 
                     # Simple fallback evaluation (case-insensitive, symbol-ignoring)
-                    typed_answer = review_data.typed_answer.lower().strip()
-                    correct_answer = flashcard.answer.lower().strip()
-
-                    # Remove ALL punctuation, symbols, and extra whitespace for comparison
-                    import re
-
-                    typed_clean = re.sub(r"[^\w\s]", "", typed_answer).strip()
-                    correct_clean = re.sub(r"[^\w\s]", "", correct_answer).strip()
-
-                    # Normalize whitespace (replace multiple spaces with single space)
-                    typed_clean = re.sub(r"\s+", " ", typed_clean)
-                    correct_clean = re.sub(r"\s+", " ", correct_clean)
-
-                    if typed_clean == correct_clean:
-                        quality_rating = 5
-                        ai_score = 100
-                        verdict = "correct"
-                        feedback = "Perfect answer!"
-                    else:
-                        # Word-based similarity (case-insensitive, symbol-ignoring)
-                        typed_words = set(typed_clean.split())
-                        correct_words = set(correct_clean.split())
-
-                        if len(correct_words) == 0:
-                            quality_rating = 1
-                            ai_score = 20
-                            verdict = "incorrect"
-                            feedback = "Answer needs improvement"
-                        else:
-                            overlap = len(typed_words.intersection(correct_words))
-                            similarity_score = (overlap / len(correct_words)) * 100
-
-                            # Much more generous scoring for real-world answers
-                            if similarity_score >= 0.8:  # Lowered from 0.9
-                                quality_rating = 5
-                                ai_score = 95
-                                verdict = "correct"
-                                feedback = "Excellent answer!"
-                            elif similarity_score >= 0.6:  # Lowered from 0.75
-                                quality_rating = 4
-                                ai_score = 80
-                                verdict = "correct"
-                                feedback = "Very good answer!"
-                            elif similarity_score >= 0.4:  # Lowered from 0.6
-                                quality_rating = 3
-                                ai_score = 65
-                                verdict = "partial"
-                                feedback = "Good effort, but missing some key points"
-                            elif similarity_score >= 0.2:  # Lowered from 0.4
-                                quality_rating = 2
-                                ai_score = 45
-                                verdict = "partial"
-                                feedback = (
-                                    "Some understanding shown, but needs improvement"
-                                )
-                            else:
-                                quality_rating = 1
-                                ai_score = 25
-                                verdict = "incorrect"
-                                feedback = "Answer needs significant improvement"
+                    quality_rating, ai_score, verdict, feedback = _score_typed_answer(
+                        review_data.typed_answer, flashcard.answer
+                    )
 
                     confidence = 70
             else:
                 # Free user - use simple evaluation
-                typed_answer = review_data.typed_answer.lower().strip()
-                correct_answer = flashcard.answer.lower().strip()
-
-                # Remove ALL punctuation, symbols, and extra whitespace for comparison
-                import re
-
-                typed_clean = re.sub(r"[^\w\s]", "", typed_answer).strip()
-                correct_clean = re.sub(r"[^\w\s]", "", correct_answer).strip()
-
-                # Normalize whitespace (replace multiple spaces with single space)
-                typed_clean = re.sub(r"\s+", " ", typed_clean)
-                correct_clean = re.sub(r"\s+", " ", correct_clean)
-
-                if typed_clean == correct_clean:
-                    quality_rating = 5
-                    ai_score = 100
-                    verdict = "correct"
-                    feedback = "Perfect answer!"
-                else:
-                    # Word-based similarity (case-insensitive, symbol-ignoring)
-                    typed_words = set(typed_clean.split())
-                    correct_words = set(correct_clean.split())
-
-                    if len(correct_words) == 0:
-                        quality_rating = 1
-                        ai_score = 20
-                        verdict = "incorrect"
-                        feedback = "Answer needs improvement"
-                    else:
-                        overlap = len(typed_words.intersection(correct_words))
-                        similarity_score = (overlap / len(correct_words)) * 100
-
-                        # Much more generous scoring for real-world answers
-                        if similarity_score >= 0.8:  # Lowered from 0.9
-                            quality_rating = 5
-                            ai_score = 95
-                            verdict = "correct"
-                            feedback = "Excellent answer!"
-                        elif similarity_score >= 0.6:  # Lowered from 0.75
-                            quality_rating = 4
-                            ai_score = 80
-                            verdict = "correct"
-                            feedback = "Very good answer!"
-                        elif similarity_score >= 0.4:  # Lowered from 0.6
-                            quality_rating = 3
-                            ai_score = 65
-                            verdict = "partial"
-                            feedback = "Good effort, but missing some key points"
-                        elif similarity_score >= 0.2:  # Lowered from 0.4
-                            quality_rating = 2
-                            ai_score = 45
-                            verdict = "partial"
-                            feedback = "Some understanding shown, but needs improvement"
-                        else:
-                            quality_rating = 1
-                            ai_score = 25
-                            verdict = "incorrect"
-                            feedback = "Answer needs significant improvement"
+                quality_rating, ai_score, verdict, feedback = _score_typed_answer(
+                    review_data.typed_answer, flashcard.answer
+                )
 
                 confidence = 70
 
         # Update SRS
-        srs_entry = update_srs_after_review(db, flashcard_id, user_id, quality_rating)
+        srs_entry = await asyncio.to_thread(
+            update_srs_after_review,
+            db,
+            flashcard_id,
+            user_id,
+            quality_rating,
+            now=now,
+            commit=False,
+        )
 
         # Update flashcard progress
         flashcard.review_count += 1
-        flashcard.last_reviewed = datetime.now(timezone.utc)
+        flashcard.last_reviewed = now
 
         # Map quality to performance score
         performance_map = {0: 0, 1: 20, 2: 40, 3: 60, 4: 80, 5: 100}
@@ -1684,18 +1690,18 @@ async def review_flashcard(
         elif performance_score < 50:
             flashcard.mastery_level = max(0, flashcard.mastery_level - 10)
 
-        # Update tags based on performance
-        if not flashcard.tags:
-            flashcard.tags = []
-
+        # Update tags based on performance (assign a new list: in-place
+        # changes to an ARRAY column aren't picked up by the flush)
         if performance_score >= 80 and srs_entry.repetitions >= 3:
             if "recently_learned" not in flashcard.tags:
-                flashcard.tags.append("recently_learned")
+                flashcard.tags = [*flashcard.tags, "recently_learned"]
         elif performance_score < 50:
             if "recently_learned" in flashcard.tags:
-                flashcard.tags.remove("recently_learned")
+                flashcard.tags = [
+                    t for t in flashcard.tags if t != "recently_learned"
+                ]
 
-        db.commit()
+        await asyncio.to_thread(db.commit)
 
         # Record review event
         try:
@@ -1811,6 +1817,13 @@ async def remove_flashcard_tag_endpoint(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
 
+# Contextual generation scores the note against at most this many of the
+# user's most recent notes (id/title/content rows only). The cap bounds the
+# similarity scoring and the rows held per request; older notes are not
+# candidates.
+CONTEXT_CANDIDATE_LIMIT = 500
+
+
 @app.post(
     "/notes/{note_id}/flashcards/contextual/generate",
     response_model=List[FlashcardResponse],
@@ -1832,48 +1845,52 @@ async def generate_contextual_flashcards(
         )
 
     try:
-        # Get note similarities to find strongest connections
-        notes_data = [{"id": note.id, "title": note.title, "content": note.content}]
-        similarities = calculate_note_similarities(notes_data)
-
-        # Get top 5 most similar notes
-        context_notes = []
-        if similarities:
-            # Sort by similarity and get top 5
-            sorted_sims = sorted(
-                similarities, key=lambda x: x["similarity"], reverse=True
-            )
-            top_notes = sorted_sims[:5]
+        # Score only this note against the user's other notes to find its
+        # strongest connections (one similarity row, no full-corpus refit)
+        other_notes = {
+            n.id: n
+            for n in get_note_rows_by_user(db, user_id, limit=CONTEXT_CANDIDATE_LIMIT)
+            if n.id != note.id
+        }
+        similarities = await find_related_notes(
+            {"id": note.id, "title": note.title, "content": note.content},
+            [
+                {"id": n.id, "title": n.title, "content": n.content}
+                for n in other_notes.values()
+            ],
+            top_k=5,
+        )
 
-            for sim in top_notes:
-                if sim["source_id"] != note_id:
-                    context_notes.append(sim["source_id"])
-                elif sim["target_id"] != note_id:
-                    context_notes.append(sim["target_id"])
+        # Top 5 most similar notes
+        context_notes = [sim["target_id"] for sim in similarities]
 
         # Generate flashcards with context
-        contextual_content = note.content
+        # Collect parts and join once so long notes are not re-copied per context note
+        context_parts = [note.content]
         if context_notes:
             # Add context from related notes
             for ctx_note_id in context_notes:
-                ctx_note = get_note_by_id(db, ctx_note_id, user_id)
+                ctx_note = other_notes.get(ctx_note_id)
                 if ctx_note:
-                    contextual_content += f"\n\nRelated context from '{ctx_note.title}':\n{ctx_note.content[:500]}..."
+                    context_parts.append(
+                        f"\n\nRelated context from '{ctx_note.title}':\n{ctx_note.content[:500]}..."
+                    )
+        contextual_content = "".join(context_parts)
 
         generated_flashcards = await generate_flashcards_from_content(
             contextual_content, count
         )
 
+        flashcards = create_contextual_flashcards_bulk(
+            db,
+            [(f.question, f.answer) for f in generated_flashcards],
+            note_id,
+            user_id,
+            context_notes,
+        )
+
         saved_flashcards = []
-        for flashcard_data in generated_flashcards:
-            flashcard = create_contextual_flashcard(
-                db,
-                flashcard_data.question,
-                flashcard_data.answer,
-                note_id,
-                user_id,
-                context_notes,
-            )
+        for flashcard in flashcards:
             try:
                 record_event(db, user_id, "FLASHCARD_CREATED", target_id=flashcard.id)
             except Exception:
@@ -1934,20 +1951,16 @@ async def generate_flashcards_enhanced(
             )
 
             # Save flashcards
-            saved_flashcards = []
-            for flashcard_data in generated_flashcards:
-                flashcard = create_flashcard(
-                    db,
-                    flashcard_data.question,
-                    flashcard_data.answer,
-                    request_data.note_id,
-                    user_id,
-                    "single_note",
-                )
-
-                # Create SRS entry
-                get_or_create_srs_entry(db, flashcard.id, user_id)
+            flashcards = create_flashcards_bulk(
+                db,
+                [(f.question, f.answer) for f in generated_flashcards],
+                request_data.note_id,
+                user_id,
+                "single_note",
+            )
 
+            saved_flashcards = []
+            for flashcard in flashcards:
                 try:
                     record_event(
                         db, user_id, "FLASHCARD_CREATED", target_id=flashcard.id
@@ -1972,6 +1985,11 @@ async def generate_flashcards_enhanced(
                     )
                 )
 
+            # Create SRS entries, committed together
+            for flashcard in saved_flashcards:
+                get_or_create_srs_entry(db, flashcard.id, user_id, commit=False)
+            db.commit()
+
             return FlashcardGenerationResponse(
                 flashcard_set_id=flashcard_set.id,
                 cards=saved_flashcards,
@@ -1979,37 +1997,42 @@ async def generate_flashcards_enhanced(
             )
 
         elif request_data.mode == "context":
-            # Context-graph mode
-            notes_data = [{"id": note.id, "title": note.title, "content": note.content}]
-            similarities = calculate_note_similarities(notes_data)
-
-            # Get top neighbors
-            context_notes = []
-            if similarities:
-                sorted_sims = sorted(
-                    similarities, key=lambda x: x["similarity"], reverse=True
+            # Context-graph mode: score only this note against the user's other notes
+            other_notes = {
+                n.id: n
+                for n in get_note_rows_by_user(
+                    db, user_id, limit=CONTEXT_CANDIDATE_LIMIT
                 )
-                top_notes = sorted_sims[: request_data.neighbors or 5]
+                if n.id != note.id
+            }
+            similarities = await find_related_notes(
+                {"id": note.id, "title": note.title, "content": note.content},
+                [
+                    {"id": n.id, "title": n.title, "content": n.content}
+                    for n in other_notes.values()
+                ],
+                top_k=request_data.neighbors or 5,
+            )
 
-                for sim in top_notes:
-                    if sim["source_id"] != request_data.note_id:
-                        context_notes.append(sim["source_id"])
-                    elif sim["target_id"] != request_data.note_id:
-                        context_notes.append(sim["target_id"])
+            # Get top neighbors
+            context_notes = [sim["target_id"] for sim in similarities]
 
             # Generate contextual content
-            contextual_content = note.content
+            context_parts = [note.content]
             total_tokens = len(note.content.split())  # Rough token estimate
 
             for ctx_note_id in context_notes:
                 if total_tokens >= (request_data.token_cap or 2500):
                     break
 
-                ctx_note = get_note_by_id(db, ctx_note_id, user_id)
+                ctx_note = other_notes.get(ctx_note_id)
                 if ctx_note:
                     note_content = ctx_note.content[:500]  # Limit context per note
-                    contextual_content += f"\n\nRelated context from '{ctx_note.title}':\n{note_content}..."
+                    context_parts.append(
+                        f"\n\nRelated context from '{ctx_note.title}':\n{note_content}..."
+                    )
                     total_tokens += len(note_content.split())
+            contextual_content = "".join(context_parts)
 
             # Generate flashcards
             generated_flashcards = await generate_flashcards_from_content(
@@ -2022,19 +2045,18 @@ async def generate_flashcards_enhanced(
             )
 
             # Save flashcards
-            saved_flashcards = []
-            for flashcard_data in generated_flashcards:
-                flashcard = create_contextual_flashcard(
-                    db,
-                    flashcard_data.question,
-                    flashcard_data.answer,
-                    request_data.note_id,
-                    user_id,
-                    context_notes,
-                )
+            flashcards = create_contextual_flashcards_bulk(
+                db,
+                [(f.question, f.answer) for f in generated_flashcards],
+                request_data.note_id,
+                user_id,
+                context_notes,
+            )
 
-                # Create SRS entry
-                get_or_create_srs_entry(db, flashcard.id, user_id)
+            saved_flashcards = []
+            for flashcard in flashcards:
+                # Create SRS entry (committed with the rest below)
+                get_or_create_srs_entry(db, flashcard.id, user_id, commit=False)
 
                 try:
                     record_event(
@@ -2060,6 +2082,8 @@ async def generate_flashcards_enhanced(
                     )
                 )
 
+            db.commit()
+
             return FlashcardGenerationResponse(
                 flashcard_set_id=flashcard_set.id,
                 cards=saved_flashcards,
@@ -2093,8 +2117,9 @@ async def review_flashcard_enhanced(
     await check_rate_limit(request, str(user_id))
 
     try:
-        # Get flashcard
-        flashcard = db.query(Flashcard).filter(Flashcard.id == flashcard_id).first()
+        # Get flashcard (blocking DB calls run off the event loop, as in
+        # review_flashcard)
+        flashcard = await asyncio.to_thread(db.get, Flashcard, flashcard_id)
         if not flashcard:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Flashcard not found"
@@ -2154,12 +2179,21 @@ async def review_flashcard_enhanced(
             else:
                 quality_rating = 1  # Very Poor - Almost no key points
 
-        # Update SRS
-        srs_entry = update_srs_after_review(db, flashcard_id, user_id, quality_rating)
+        # Update SRS (one timestamp for the whole review)
+        now = datetime.now(timezone.utc)
+        srs_entry = await asyncio.to_thread(
+            update_srs_after_review,
+            db,
+            flashcard_id,
+            user_id,
+            quality_rating,
+            now=now,
+            commit=False,
+        )
 
         # Update flashcard progress
         flashcard.review_count += 1
-        flashcard.last_reviewed = datetime.now(timezone.utc)
+        flashcard.last_reviewed = now
 
         # Map quality to performance score
         performance_map = {0: 0, 1: 20, 2: 40, 3: 60, 4: 80, 5: 100}
@@ -2172,18 +2206,18 @@ async def review_flashcard_enhanced(
         elif performance_score < 50:
             flashcard.mastery_level = max(0, flashcard.mastery_level - 10)
 
-        # Update tags based on performance
-        if not flashcard.tags:
-            flashcard.tags = []
-
+        # Update tags based on performance (assign a new list: in-place
+        # changes to an ARRAY column aren't picked up by the flush)
         if performance_score >= 80 and srs_entry.repetitions >= 3:
             if "recently_learned" not in flashcard.tags:
-                flashcard.tags.append("recently_learned")
+                flashcard.tags = [*flashcard.tags, "recently_learned"]
         elif performance_score < 50:
             if "recently_learned" in flashcard.tags:
-                flashcard.tags.remove("recently_learned")
+                flashcard.tags = [
+                    t for t in flashcard.tags if t != "recently_learned"
+                ]
 
-        db.commit()
+        await asyncio.to_thread(db.commit)
 
         # Record review event
         try:
@@ -2252,7 +2286,7 @@ async def review_flashcard_enhanced(
 async def get_flashcard_sets(
     request: Request = None,
     user_id: uuid.UUID = Depends(get_current_user_id),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Get all flashcard sets for a user"""
     await check_rate_limit(request, str(user_id))
@@ -2354,12 +2388,13 @@ async def archive_mastered_flashcards_endpoint(
 async def get_notes_graph(
     request: Request,
     user_id: uuid.UUID = Depends(get_current_user_id),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Get graph visualization of notes"""
     await check_rate_limit(request, str(user_id))
 
-    notes = get_notes_by_user(db, user_id)
+    # Plain rows: the graph only reads id/title/content/created_at
+    notes = get_note_rows_by_user(db, user_id)
 
     if len(notes) < 2:
         return GraphResponse(
@@ -2385,7 +2420,7 @@ async def get_notes_graph(
     ]
 
     # Calculate connections
-    connections = calculate_note_similarities(notes_data)
+    connections = await calculate_note_similarities(notes_data)
 
     # Create graph nodes
     nodes = [
@@ -2455,7 +2490,9 @@ async def suggest_keywords(
         raise HTTPException(status_code=404, detail="Note not found")
     word_count = len((note.content or "").split())
     max_keywords = 8 if word_count < 400 else 12 if word_count < 1200 else 18
-    keywords = ai_service.extract_keywords(note.content, max_keywords=max_keywords)
+    keywords = await ai_service.extract_keywords_async(
+        note.content, max_keywords=max_keywords
+    )
     return KeywordsSuggestResponse(note_id=note.id, keywords=keywords)
 
 
@@ -2464,7 +2501,7 @@ async def suggest_keywords(
 async def profile_summary(
     request: Request,
     user_id: uuid.UUID = Depends(get_current_user_id),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     await check_rate_limit(request, str(user_id))
     totals = get_totals(db, user_id)
@@ -2496,7 +2533,7 @@ async def profile_activity(
     kind: str = "all",
     request: Request = None,
     user_id: uuid.UUID = Depends(get_current_user_id),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     await check_rate_limit(request, str(user_id))
     # Parse dates as UTC-midnight boundaries
@@ -2505,29 +2542,15 @@ async def profile_activity(
     # Set end to the end of the day (23:59:59.999999) to include all activity on that date
     end = end_inclusive.replace(hour=23, minute=59, second=59, microsecond=999999)
 
-    # Try to use daily aggregates first; fall back to on-the-fly if missing
-    agg_rows = (
-        db.query(ActivityDaily.day, ActivityDaily.count)
-        .filter(
-            ActivityDaily.user_id == user_id,
-            ActivityDaily.day >= start.date(),
-            ActivityDaily.day <= end_inclusive.date(),
-            ActivityDaily.kind == kind,
-        )
-        .order_by(ActivityDaily.day)
-        .all()
-    )
-    if agg_rows:
-        rows = [(d, c, None) for (d, c) in agg_rows]
-    else:
-        rows = get_activity_counts(db, user_id, start, end, kind=kind)
+    # Daily aggregates are kept current by a trigger on events
+    rows = get_activity_counts(db, user_id, start, end, kind=kind, with_top_type=True)
+    rows_by_day = {r[0]: r for r in rows}
 
     # Materialize day list for continuity
     days_out: list[ActivityDayCount] = []
     cursor = start.date()
     while cursor <= end_inclusive.date():
-        # find row for cursor
-        found = next((r for r in rows if r[0].date() == cursor), None)
+        found = rows_by_day.get(cursor)
         if found:
             days_out.append(
                 ActivityDayCount(
@@ -2549,7 +2572,7 @@ async def profile_activity(
 async def profile_recent(
     request: Request,
     user_id: uuid.UUID = Depends(get_current_user_id),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     await check_rate_limit(request, str(user_id))
     events = get_recent_events(db, user_id, limit=10)
@@ -2572,10 +2595,10 @@ async def profile_export(
     db: Session = Depends(get_db),
 ):
     await check_rate_limit(request, str(user_id))
-    # Collect user notes and flashcards
-    notes = get_notes_by_user(db, user_id)
-    out = {
-        "notes": [
+    # Collect user notes and flashcards in one pass over a streamed cursor
+    out = {"notes": [], "flashcards": []}
+    for n in iter_notes_by_user(db, user_id, with_flashcards=True):
+        out["notes"].append(
             {
                 "id": str(n.id),
                 "title": n.title,
@@ -2585,13 +2608,8 @@ async def profile_export(
                 "created_at": n.created_at.isoformat() if n.created_at else None,
                 "updated_at": n.updated_at.isoformat() if n.updated_at else None,
             }
-            for n in notes
-        ],
-        "flashcards": [],
-    }
-    for n in notes:
-        fcs = get_flashcards_by_note(db, n.id)
-        for f in fcs:
+        )
+        for f in n.flashcards:
             out["flashcards"].append(
                 {
                     "id": str(f.id),
@@ -2638,32 +2656,11 @@ async def profile_aggregate(
     db: Session = Depends(get_db),
 ):
     """Compute daily aggregates for the authenticated user over all time.
-    Dev-friendly: safe to run repeatedly (upserts).
+    Dev-friendly: safe to run repeatedly (rebuilds the rows).
     """
     await check_rate_limit(request, str(user_id))
-    # Use raw SQL for concise upsert aggregates
-    for kind, filter_clause in (
-        ("all", ""),
-        ("notes", "AND event_type IN ('NOTE_CREATED','NOTE_REVIEWED')"),
-        ("flashcards", "AND event_type IN ('FLASHCARD_CREATED','FLASHCARD_REVIEWED')"),
-    ):
-        stmt = sql_text(
-            """
-            INSERT INTO activity_daily (user_id, day, kind, count)
-            SELECT :uid AS user_id,
-                   DATE(occurred_at AT TIME ZONE 'UTC') AS day,
-                   :kind AS kind,
-                   COUNT(*) AS count
-            FROM events
-            WHERE user_id = :uid
-            {filter_clause}
-            GROUP BY DATE(occurred_at AT TIME ZONE 'UTC')
-            ON CONFLICT (user_id, day, kind)
-            DO UPDATE SET count = EXCLUDED.count;
-            """.format(filter_clause=filter_clause)
-        )
-        db.execute(stmt, {"uid": str(user_id), "kind": kind})
-    db.commit()
+    # Rebuilds from all recorded events, including buffered ones
+    await asyncio.to_thread(rebuild_activity_daily, db, user_id)
     return SuccessResponse(message="Aggregates updated")
 
 
@@ -2707,13 +2704,11 @@ async def upload_image(
 async def get_profile_settings(
     request: Request,
     user_id: uuid.UUID = Depends(get_current_user_id),
+    user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Get current user profile information"""
     await check_rate_limit(request, str(user_id))
-    user = get_user_by_id(db, user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
     return UserResponse(
         id=user.id,
         email=user.email,
@@ -2731,15 +2726,12 @@ async def update_profile_settings(
     request: Request,
     profile_update: UserProfileUpdate,
     user_id: uuid.UUID = Depends(get_current_user_id),
+    user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Update user profile settings"""
     await check_rate_limit(request, str(user_id))
 
-    user = get_user_by_id(db, user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     # Check if username is being changed and if it's available
     if profile_update.username and profile_update.username != user.username:
         existing_user = get_user_by_username(db, profile_update.username)
@@ -2756,7 +2748,9 @@ async def update_profile_settings(
     if profile_update.new_password:
         # If user has no password yet (OAuth-only), allow setting it without current_password
         if user.password_hash is None:
-            hashed = get_password_hash(profile_update.new_password)
+            hashed = await asyncio.to_thread(
+                get_password_hash, profile_update.new_password
+            )
         else:
             if not profile_update.current_password:
                 raise HTTPException(
@@ -2765,13 +2759,17 @@ async def update_profile_settings(
                 )
 
             # Verify current password
-            if not verify_password(profile_update.current_password, user.password_hash):
+            if not await asyncio.to_thread(
+                verify_password, profile_update.current_password, user.password_hash
+            ):
                 raise HTTPException(
                     status_code=400, detail="Current password is incorrect"
                 )
 
             # Hash new password
-            hashed = get_password_hash(profile_update.new_password)
+            hashed = await asyncio.to_thread(
+                get_password_hash, profile_update.new_password
+            )
 
     # Prepare update data
     update_data = {}
@@ -2824,13 +2822,11 @@ async def forgot_password(
 async def request_account_deletion(
     request: Request,
     user_id: uuid.UUID = Depends(get_current_user_id),
+    user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Initiate account deletion via email confirmation."""
     await check_rate_limit(request, str(user_id))
-    user = get_user_by_id(db, user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
 
     # Reuse verification token machinery with a dedicated type
     token_data = {
@@ -2890,6 +2886,8 @@ async def confirm_account_deletion(
 
     # Delete user-related data (DB-level, handle FKs manually to avoid violations)
     uid = str(user.id)
+    # Write out buffered events first so none land after the user is gone
+    await asyncio.to_thread(flush_events)
     try:
         # Delete review and SRS data first (depend on flashcards/users)
         db.execute(
@@ -2954,7 +2952,7 @@ async def reset_password(payload: ResetPasswordRequest, db: Session = Depends(ge
         raise HTTPException(status_code=404, detail="User not found")
 
     # Set new password
-    hashed = get_password_hash(payload.new_password)
+    hashed = await asyncio.to_thread(get_password_hash, payload.new_password)
     update_user_profile(db, user.id, password_hash=hashed)
 
     return {"message": "Password has been reset successfully."}
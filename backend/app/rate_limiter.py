@@ -49,7 +49,7 @@ def get_client_ip(request: Request) -> str:
     # Check for forwarded headers (for reverse proxies)
     forwarded_for = request.headers.get("X-Forwarded-For")
     if forwarded_for:
-        return forwarded_for.split(",")[0].strip()
+        return forwarded_for.partition(",")[0].strip()
 
     real_ip = request.headers.get("X-Real-IP")
     if real_ip:
@@ -4,8 +4,9 @@ Implements per-user and per-IP rate limiting with different tiers and AI cost tr
 """
 
 import asyncio
+import socket
 import time
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 import redis.asyncio as redis
@@ -87,31 +88,48 @@ class EnhancedRateLimiter:
     def __init__(self, redis_url: str = "redis://localhost:6379"):
         self.redis_url = redis_url
         self.redis_client: Optional[redis.Redis] = None
+        self.redis_pool: Optional[redis.BlockingConnectionPool] = None
+        # Local fallback counters: key -> {"count", "expires_at"}. The expiry is
+        # fixed when the window's counter is created, like a Redis TTL.
         self.local_cache: Dict[str, Dict] = {}
-        self.cache_ttl = 60  # Local cache TTL in seconds
         # In-memory user tier overrides (user_id -> UserTier)
         self.user_tiers: Dict[str, UserTier] = {}
 
     async def init_redis(self):
-        """Initialize Redis connection."""
+        """Initialize Redis connection pool."""
         try:
-            self.redis_client = redis.from_url(
+            # One bounded pool of keepalive connections shared by every request,
+            # so bursts of rate-limit checks reuse sockets instead of reconnecting
+            keepalive_options = {}
+            if hasattr(socket, "TCP_KEEPIDLE"):
+                keepalive_options[socket.TCP_KEEPIDLE] = 60
+            self.redis_pool = redis.BlockingConnectionPool.from_url(
                 self.redis_url,
+                max_connections=64,
+                timeout=5,
                 encoding="utf-8",
                 decode_responses=True,
                 socket_connect_timeout=5,
                 socket_timeout=5,
+                socket_keepalive=True,
+                socket_keepalive_options=keepalive_options,
+                client_name="enhanced_rate_limiter",
             )
+            self.redis_client = redis.Redis(connection_pool=self.redis_pool)
             await self.redis_client.ping()
             logger.info("Enhanced Redis connection established")
         except Exception as e:
             logger.warning(f"Enhanced Redis connection failed: {e}. Using local cache.")
-            self.redis_client = None
+            await self.close_redis()
 
     async def close_redis(self):
-        """Close Redis connection."""
+        """Close Redis connection pool."""
         if self.redis_client:
             await self.redis_client.close()
+            self.redis_client = None
+        if self.redis_pool:
+            await self.redis_pool.disconnect()
+            self.redis_pool = None
 
     def _get_cache_key(self, identifier: str, window: str) -> str:
         """Generate cache key for rate limiting."""
@@ -122,48 +140,57 @@ class EnhancedRateLimiter:
         now = int(time.time())
         return {"minute": now // 60, "hour": now // 3600, "day": now // 86400}
 
-    async def _get_count(self, key: str) -> int:
-        """Get current count from Redis or local cache."""
+    async def _get_counts(self, keys: List[str]) -> List[int]:
+        """Get several counts in a single round trip (MGET), falling back to local cache."""
         if self.redis_client:
             try:
-                count = await self.redis_client.get(key)
-                return int(count) if count else 0
+                counts = await self.redis_client.mget(keys)
+                return [int(count) if count else 0 for count in counts]
             except Exception as e:
-                logger.warning(f"Redis get failed: {e}")
+                logger.warning(f"Redis mget failed: {e}")
 
         # Fallback to local cache
-        cache_entry = self.local_cache.get(key)
-        if cache_entry and time.time() - cache_entry["timestamp"] < self.cache_ttl:
-            return cache_entry["count"]
-        return 0
-
-    async def _increment_count(self, key: str, ttl: int) -> int:
-        """Increment count in Redis or local cache."""
+        now = time.time()
+        results = []
+        for key in keys:
+            cache_entry = self.local_cache.get(key)
+            if cache_entry and now < cache_entry["expires_at"]:
+                results.append(cache_entry["count"])
+            else:
+                results.append(0)
+        return results
+
+    async def _increment_counts(self, items: List[Tuple[str, int]]) -> List[int]:
+        """Increment several counts in one pipelined round trip, falling back to local cache."""
         if self.redis_client:
             try:
                 pipe = self.redis_client.pipeline()
-                pipe.incr(key)
-                pipe.expire(key, ttl)
+                for key, ttl in items:
+                    pipe.incr(key)
+                    pipe.expire(key, ttl)
                 results = await pipe.execute()
-                return results[0]
+                return results[::2]
             except Exception as e:
                 logger.warning(f"Redis increment failed: {e}")
 
         # Fallback to local cache
         now = time.time()
-        cache_entry = self.local_cache.get(key, {"count": 0, "timestamp": now})
+        counts = []
+        for key, ttl in items:
+            cache_entry = self.local_cache.get(key)
 
-        # Reset if expired
-        if now - cache_entry["timestamp"] > ttl:
-            cache_entry = {"count": 0, "timestamp": now}
+            # Start a new counter if missing or expired
+            if not cache_entry or now >= cache_entry["expires_at"]:
+                cache_entry = {"count": 0, "expires_at": now + ttl}
 
-        cache_entry["count"] += 1
-        self.local_cache[key] = cache_entry
+            cache_entry["count"] += 1
+            self.local_cache[key] = cache_entry
+            counts.append(cache_entry["count"])
 
         # Clean old entries
         self._cleanup_local_cache()
 
-        return cache_entry["count"]
+        return counts
 
     def _cleanup_local_cache(self):
         """Clean expired entries from local cache."""
@@ -171,7 +198,7 @@ class EnhancedRateLimiter:
         expired_keys = [
             key
             for key, entry in self.local_cache.items()
-            if now - entry["timestamp"] > self.cache_ttl
+            if now >= entry["expires_at"]
         ]
         for key in expired_keys:
             del self.local_cache[key]
@@ -232,12 +259,15 @@ class EnhancedRateLimiter:
 
         remaining = {}
 
-        for window, limit, ttl in checks:
-            key = self._get_cache_key(
+        keys = [
+            self._get_cache_key(
                 identifier, f"{window}:{windows.get(window, windows['day'])}"
             )
-            current_count = await self._get_count(key)
+            for window, _, _ in checks
+        ]
+        counts = await self._get_counts(keys)
 
+        for (window, limit, ttl), current_count in zip(checks, counts):
             remaining[window] = max(0, limit - current_count)
 
             if current_count >= limit:
@@ -280,11 +310,18 @@ class EnhancedRateLimiter:
 
         remaining = {}
 
-        for window, limit, ttl in records:
-            key = self._get_cache_key(
-                identifier, f"{window}:{windows.get(window, windows['day'])}"
+        items = [
+            (
+                self._get_cache_key(
+                    identifier, f"{window}:{windows.get(window, windows['day'])}"
+                ),
+                ttl,
             )
-            current_count = await self._increment_count(key, ttl)
+            for window, _, ttl in records
+        ]
+        counts = await self._increment_counts(items)
+
+        for (window, limit, ttl), current_count in zip(records, counts):
             remaining[window] = max(0, limit - current_count)
 
         return remaining
@@ -326,18 +363,23 @@ class EnhancedRateLimiter:
         }
 
         # Get current usage
-        for window, limit in [
+        usage_windows = [
             ("minute", limits.requests_per_minute),
             ("hour", limits.requests_per_hour),
             ("day", limits.requests_per_day),
             ("ai_day", limits.ai_requests_per_day),
             ("notes_day", limits.max_notes_per_day),
-        ]:
-            key = self._get_cache_key(
+        ]
+        keys = [
+            self._get_cache_key(
                 identifier,
                 f"{window}:{windows.get(window.replace('_day', ''), windows['day'])}",
             )
-            current_count = await self._get_count(key)
+            for window, _ in usage_windows
+        ]
+        counts = await self._get_counts(keys)
+
+        for (window, limit), current_count in zip(usage_windows, counts):
             stats["usage"][window] = current_count
             stats["remaining"][window] = max(0, limit - current_count)
 
@@ -353,7 +395,7 @@ async def get_client_identifier(request: Request) -> str:
     # Try to get real IP from headers (for reverse proxy setups)
     forwarded_for = request.headers.get("X-Forwarded-For")
     if forwarded_for:
-        return forwarded_for.split(",")[0].strip()
+        return forwarded_for.partition(",")[0].strip()
 
     real_ip = request.headers.get("X-Real-IP")
     if real_ip:
@@ -299,7 +299,7 @@ class Flashcard(FlashcardBase):
     review_count: int = 0
     mastery_level: int = 0
     last_performance: Optional[int] = None
-    user_answer_history: Optional[Dict[str, Any]] = None
+    user_answer_history: Optional[List[Dict[str, Any]]] = None
 
 
 class FlashcardResponse(BaseSchema):
@@ -18,6 +18,7 @@ from app.database import (
     create_note,
     create_flashcard,
     record_event,
+    rebuild_activity_daily,
     set_note_tags,
     add_flashcard_tag,
 )
@@ -545,11 +546,13 @@ Mental health is as important as physical health and nutrition for overall welln
             user_id=user_id,
             title=note_data["title"],
             content=note_data["content"],
+            commit=False,
         )
-        set_note_tags(db, note, note_data["tags"])
+        set_note_tags(db, note, note_data["tags"], commit=False)
         created_notes.append(note)
         print(f"Created note: {note.title}")
 
+    db.commit()
     return created_notes
 
 
@@ -974,6 +977,8 @@ def main():
         if DEBUG:
             print("\n📊 Creating demo activity data...")
         create_demo_activity(db, user.id, notes, flashcards)
+        # Cleared events leave their daily aggregates behind; recount them
+        rebuild_activity_daily(db, user.id)
 
         if DEBUG:
             print(f"\n🎉 Demo data created successfully!")
@@ -0,0 +1,122 @@
+"""SM-2-lite transitions against the original Python implementation.
+
+The review step runs as SQL (see _srs_review_values); here it is evaluated on
+SQLite with greatest()/round() standing in for their Postgres double
+precision versions (max, and round-half-even like rint()).
+"""
+
+from datetime import date, timedelta
+from itertools import product
+
+import pytest
+from sqlalchemy import create_engine, event, select, text
+
+from app.database import FlashcardSRS, _srs_first_review_values, _srs_review_values
+
+TODAY = date(2026, 1, 15)
+
+
+def _old_srs_step(repetitions, interval_days, efactor, quality):
+    """update_srs_after_review as it was written in Python"""
+    if quality < 3:
+        repetitions = 0
+        interval_days = 1
+    else:
+        repetitions += 1
+
+        if repetitions == 1:
+            interval_days = 1
+        elif repetitions == 2:
+            interval_days = 6
+        else:
+            ef = efactor / 100.0
+            new_interval = round(interval_days * ef)
+            interval_days = max(1, new_interval)
+
+        ef = efactor / 100.0
+        ef_change = 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+        new_ef = max(1.3, ef + ef_change)
+        efactor = round(new_ef * 100)
+
+    return repetitions, interval_days, efactor, TODAY + timedelta(days=interval_days)
+
+
+@pytest.fixture(scope="module")
+def srs_rows():
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def _pg_functions(dbapi_conn, _):
+        dbapi_conn.create_function("greatest", -1, max)
+        dbapi_conn.create_function("round", 1, round)
+
+    states = list(
+        product(
+            range(5),
+            (1, 2, 3, 6, 7, 10, 15, 16, 25, 37, 50, 99, 100, 180, 365),
+            range(130, 301),
+        )
+    )
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE flashcard_srs "
+                "(repetitions INTEGER, interval_days INTEGER, efactor INTEGER)"
+            )
+        )
+        conn.execute(
+            text("INSERT INTO flashcard_srs VALUES (:r, :i, :e)"),
+            [{"r": r, "i": i, "e": e} for r, i, e in states],
+        )
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.parametrize("quality", range(6))
+def test_first_review_matches_python(quality):
+    values = _srs_first_review_values(quality, TODAY)
+    got = (
+        values["repetitions"],
+        values["interval_days"],
+        values["efactor"],
+        values["due_date"],
+    )
+    assert got == _old_srs_step(0, 1, 250, quality)
+
+
+@pytest.mark.parametrize("quality", range(6))
+def test_review_step_matches_python(srs_rows, quality):
+    values = _srs_review_values(quality, TODAY)
+    stmt = select(
+        FlashcardSRS.repetitions,
+        FlashcardSRS.interval_days,
+        FlashcardSRS.efactor,
+        values["repetitions"],
+        values["interval_days"],
+        values.get("efactor", FlashcardSRS.efactor),
+    )
+    with srs_rows.connect() as conn:
+        rows = conn.execute(stmt).all()
+
+    assert rows
+    for reps, interval, efactor, new_reps, new_interval, new_efactor in rows:
+        expected = _old_srs_step(reps, interval, efactor, quality)
+        got = (
+            new_reps,
+            new_interval,
+            new_efactor,
+            TODAY + timedelta(days=new_interval),
+        )
+        assert got == expected, (reps, interval, efactor)
+
+
+def test_interval_ties_round_to_even(srs_rows):
+    # 6 days at E-Factor 1.75 is 10.5: Python's round, and Postgres round() on
+    # double precision, give 10 where round() on numeric would give 11
+    stmt = select(_srs_review_values(5, TODAY)["interval_days"]).where(
+        FlashcardSRS.repetitions == 2,
+        FlashcardSRS.interval_days == 6,
+        FlashcardSRS.efactor == 175,
+    )
+    with srs_rows.connect() as conn:
+        assert conn.execute(stmt).scalar_one() == 10